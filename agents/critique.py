@@ -1,10 +1,37 @@
-from typing import Dict, Any, List
-from langchain_core.prompts import ChatPromptTemplate
+"""
+Critique agent: votes across the five worker analyses to rank findings by consensus.
+
+Works with any LangChain chat model; main.create_llm supplies ChatOpenAI or
+ChatBedrockConverse, optionally on a latency-optimized tier (LLM_LATENCY_OPTIMIZED).
+"""
+
+from typing import Dict, Any
 from langchain_core.messages import HumanMessage, SystemMessage
+from agents.prompt_caching import cacheable_content
+from agents.worker_factory import WORKER_KEYS
+from utils.semantic_cache import SemanticCachingLLM
+
+_USER_HEADER = """
+        Security Investigation Request: {human_input}
+        Analysis Plan: {plan}
+
+        Worker Analyses:
+        """
+
+_USER_FOOTER = """
+        Evaluate these analyses using the voting mechanism:
+        1. Identify where multiple specialists found similar evidence
+        2. Assess the quality and specificity of the evidence
+        3. Rate confidence based on number of specialists in agreement
+        4. Ensure each finding is tied to specific log entries
+        5. Verify that recommended actions include platform-specific commands
+        
+        Present your findings in order of confidence, focusing on issues with the strongest evidence.
+        """
 
 class Critique:
     def __init__(self, llm):
-        self.llm = llm
+        self.llm = SemanticCachingLLM(llm)
         self.system_prompt = """You are a senior security analyst responsible for validating findings from 
         multiple specialized CrowdStrike Falcon log analysts. Your task is to:
         
@@ -52,46 +79,31 @@ class Critique:
         - Most critical finding: [description]
         - Most urgent action needed: [description]
         """
+        self._system_message = SystemMessage(content=cacheable_content(self.system_prompt, self.llm))
 
-    def __call__(self, state: Dict[str, Any]) -> Dict[str, Any]:
+    async def __call__(self, state: Dict[str, Any]) -> Dict[str, Any]:
         print("CRITIQUE: Starting consensus analysis")
 
         # Prepare the user message with all worker outputs
-        user_message = f"""
-        Security Investigation Request: {state['human_input']}
-        Analysis Plan: {state['plan']}
-
-        Worker Analyses:
-        """
+        parts = [_USER_HEADER.format(human_input=state['human_input'], plan=state['plan'])]
 
         # Add each worker's analysis
-        for i in range(1, 6):
-            worker_key = f"worker{i}_output"
-            if worker_key in state:
-                worker_data = state[worker_key]
-                user_message += f"""
-                Worker {i} ({worker_data['role']}) Analysis:
-                {worker_data['analysis']}
-                """
-
-        user_message += """
-        Evaluate these analyses using the voting mechanism:
-        1. Identify where multiple specialists found similar evidence
-        2. Assess the quality and specificity of the evidence
-        3. Rate confidence based on number of specialists in agreement
-        4. Ensure each finding is tied to specific log entries
-        5. Verify that recommended actions include platform-specific commands
-        
-        Present your findings in order of confidence, focusing on issues with the strongest evidence.
-        """
+        for i, worker_key in enumerate(WORKER_KEYS, 1):
+            worker_data = state.get(worker_key)
+            if worker_data is not None:
+                parts.append(f"Worker {i} ({worker_data['role']}) Analysis:\n{worker_data['analysis']}")
+
+        user_message = "\n".join(parts) + _USER_FOOTER
 
-        # Create messages manually
-        system_message = SystemMessage(content=self.system_prompt)
         human_message = HumanMessage(content=user_message)
         
-        # Call the LLM directly
-        response = self.llm.invoke([system_message, human_message])
-        content = response.content
+        # Stream the LLM response so graph.astream(stream_mode="messages") can forward tokens as they arrive
+        chunks = []
+        async for chunk in self.llm.astream([self._system_message, human_message],
+                                           cache_query=state["human_input"]):
+            # Bedrock streams content as a list of blocks, so join the text rather than the content
+            chunks.append(chunk.text())
+        content = "".join(chunks)
 
         # Return only the critique output
         result = {
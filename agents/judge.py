@@ -1,13 +1,21 @@
+"""
+Judge agent: turns the critique's consensus into a verdict and remediation commands.
+
+The llm may be any LangChain chat model. Its output is long, so provider latency
+tiers configured in main.create_llm (OpenAI priority, Bedrock latency-optimized)
+matter most here.
+"""
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, Any
-from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.messages import HumanMessage, SystemMessage
 from langsmith import Client
+from agents.worker_factory import WORKER_KEYS
+from agents.prompt_caching import cacheable_content
+from utils.semantic_cache import SemanticCachingLLM
 
-class Judge:
-    def __init__(self, llm):
-        self.llm = llm
-        self.prompt = ChatPromptTemplate.from_messages([
-            ("system", """You are the final decision-maker in a CrowdStrike Falcon log analysis 
+_SYSTEM_PROMPT = """You are the final decision-maker in a CrowdStrike Falcon log analysis 
             investigation. Your role is to:
             
             1. Determine if there was a security incident based on the evidence
@@ -32,15 +40,13 @@ class Judge:
             ```
             
             NEXT STEPS: [Additional investigation recommendations]
-            """),
-            ("user", """
+            """
+
+_USER_TEMPLATE = """
             Security Investigation Request: {human_input}
             
             CrowdStrike Falcon Analysis:
             
-            Original Plan:
-            {plan}
-            
             Consolidated Findings (with voting results):
             {critique_assessment}
             
@@ -50,48 +56,72 @@ class Judge:
             2. Specific MITRE ATT&CK tactics and techniques involved
             3. Exact, executable commands for remediation
             4. Additional investigation steps needed
-            """)
-        ])
-        self.chain = self.prompt | self.llm
+            """
 
-    def __call__(self, state: Dict[str, Any]) -> Dict[str, Any]:
-        # Generate response
-        response = self.chain.invoke({
-            "human_input": state["human_input"],
-            "plan": state["plan"],
-            "critique_assessment": state["critique_output"]["assessment"]
-        })
+# Background threads for LangSmith writes, kept off the graph's critical path
+_TELEMETRY_EXECUTOR = ThreadPoolExecutor(max_workers=2, thread_name_prefix="langsmith-telemetry")
+
+# Created on first use and reused so the HTTP connection pool survives across examples
+_LANGSMITH_CLIENT = None
+_LANGSMITH_CLIENT_LOCK = threading.Lock()
+
+
+def _get_client() -> Client:
+    global _LANGSMITH_CLIENT
+    with _LANGSMITH_CLIENT_LOCK:
+        if _LANGSMITH_CLIENT is None:
+            _LANGSMITH_CLIENT = Client()
+        return _LANGSMITH_CLIENT
+
+
+def _safe_create_example(payload: Dict[str, Any]):
+    """Record an investigation as a LangSmith training example, logging any failure"""
+    try:
+        client = _get_client()
+        client.create_example(**payload)
+    except Exception as e:
+        print(f"Failed to create LangSmith example: {e}")
+
+
+class Judge:
+    def __init__(self, llm):
+        self.llm = SemanticCachingLLM(llm)
+        # Static system prompt, marked for provider-side prompt caching where supported
+        self._system_message = SystemMessage(content=cacheable_content(_SYSTEM_PROMPT, self.llm))
+        self._user_template = _USER_TEMPLATE
+
+    async def __call__(self, state: Dict[str, Any]) -> Dict[str, Any]:
+        # Generate response, streaming so graph.astream(stream_mode="messages") can forward tokens
+        user_message = self._user_template.format(
+            human_input=state["human_input"],
+            critique_assessment=state["critique_output"]["assessment"]
+        )
+        chunks = []
+        async for chunk in self.llm.astream([self._system_message, HumanMessage(content=user_message)],
+                                           cache_query=state["human_input"]):
+            # Bedrock streams content as a list of blocks, so join the text rather than the content
+            chunks.append(chunk.text())
+        content = "".join(chunks)
         
-        # Create training example in LangSmith
-        try:
-            client = Client()
-            
-            # Prepare worker outputs for training example
-            worker_outputs = []
-            for i in range(1, 6):  # Support 5 workers
-                worker_key = f"worker{i}_output"
-                if worker_key in state:
-                    worker_outputs.append({
-                        "role": state[worker_key]["role"],
-                        "analysis": state[worker_key]["analysis"]
-                    })
-            
-            client.create_example(
-                inputs={
-                    "human_input": state["human_input"],
-                    "plan": state["plan"],
-                    "worker_outputs": worker_outputs,
-                    "critique": state["critique_output"]["assessment"]
-                },
-                outputs={
-                    "judgment": response.content
-                },
-                dataset_name="crowdstrike_detection_training_examples"
-            )
-        except Exception as e:
-            print(f"Failed to create LangSmith example: {e}")
+        # Worker analyses are already captured by the worker runs' own LangSmith traces,
+        # so the example only records which specialists took part
+        worker_roles = [state[key]["role"] for key in WORKER_KEYS if key in state]
+        
+        # Create training example in LangSmith in the background; it is telemetry and must not delay the verdict
+        _TELEMETRY_EXECUTOR.submit(_safe_create_example, {
+            "inputs": {
+                "human_input": state["human_input"],
+                "plan": state["plan"],
+                "worker_roles": worker_roles,
+                "critique": state["critique_output"]["assessment"]
+            },
+            "outputs": {
+                "judgment": content
+            },
+            "dataset_name": "crowdstrike_detection_training_examples"
+        })
         
         # Return the final judgment
         return {
-            "final_judgment": {"evaluation": response.content}
-        }
\ No newline at end of file
+            "final_judgment": {"evaluation": content}
+        }
@@ -1,10 +1,121 @@
+"""
+Planner agent: writes the investigation plan and assigns the five worker roles.
+
+Expects a LangChain chat model (see main.create_llm for the OpenAI and Bedrock
+configurations). Log truncation counts tokens with the gpt-4o tokenizer whatever
+the provider, or characters when the tokenizer cannot be downloaded.
+"""
+
+import functools
+import re
 from typing import Dict, Any, List, TypedDict
+import tiktoken
+from rapidfuzz import fuzz, process
+from rapidfuzz.utils import default_process
+from langchain_core.messages import SystemMessage
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_openai import ChatOpenAI
+from agents.prompt_caching import cacheable_content
+from utils.semantic_cache import SemanticCachingLLM
+
+VALID_ROLES = (
+    "Initial Access Specialist",
+    "Execution Specialist",
+    "Persistence Specialist",
+    "Privilege Escalation Specialist",
+    "Defense Evasion Specialist",
+    "Credential Access Specialist",
+    "Discovery Specialist",
+    "Lateral Movement Specialist",
+    "Collection Specialist",
+    "Exfiltration Specialist",
+)
+_VALID_ROLES = frozenset(VALID_ROLES)
+DEFAULT_ROLE = "Discovery Specialist"
+
+# Token budget for the log sample shared by every worker prompt, to prevent context overflow
+MAX_LOG_TOKENS = 3000
+# Character cap used instead when the tokenizer cannot be loaded (e.g. offline)
+MAX_LOG_CHARS = 10000
+
+# Numbered "N. Role: tasks" entries in the WORKERS section; the role runs up to the colon
+_WORKER_RE = re.compile(r'(\d+)\.\s*([^:\n]+?)\s*:\s*(.*?)(?=\d+\.\s*[^:\n]+:|$)', re.DOTALL)
+# Strips markdown emphasis the LLM sometimes adds despite instructions
+_STAR_TBL = str.maketrans('', '', '*')
+
+# Minimum token_set_ratio score for a free-form role name to count as a known role
+_ROLE_MATCH_THRESHOLD = 75
+# Every role ends in "Specialist", so matching only looks at the part before it;
+# otherwise any "<anything> Specialist" would score highly against every role
+_SPECIALIST_RE = re.compile(r'\s*\bspecialists?\s*$', re.IGNORECASE)
+_ROLE_STEMS = tuple(_SPECIALIST_RE.sub('', role) for role in VALID_ROLES)
+# Words of a role name, splitting camelCase ("InitAccess") as well as spaces and punctuation
+_ROLE_TOKEN_RE = re.compile(r'[A-Z]+(?![a-z])|[A-Z]?[a-z]+|\d+')
+_ROLE_WORDS = tuple(stem.lower().split() for stem in _ROLE_STEMS)
+
+
+def _abbreviates(tokens: List[str], words: List[str]) -> bool:
+    """True if each token is a prefix of a role word, in order (e.g. "priv esc")"""
+    remaining = iter(words)
+    return all(any(word.startswith(token) for word in remaining) for token in tokens)
+
+
+def resolve_role(role: str):
+    """Map a free-form role name onto the closest valid role, or None if nothing is close enough"""
+    stem = _SPECIALIST_RE.sub('', role)
+    key = default_process(stem)
+    if not key:
+        return None
+    # Truncations such as "Exfil" or "Lateral Movement" are part of a valid role name
+    for valid_role, role_stem in zip(VALID_ROLES, _ROLE_STEMS):
+        if key in role_stem.lower():
+            return valid_role
+    # Abbreviations such as "InitAccess" or "Priv Esc"
+    tokens = [token.lower() for token in _ROLE_TOKEN_RE.findall(stem)]
+    for valid_role, words in zip(VALID_ROLES, _ROLE_WORDS):
+        if _abbreviates(tokens, words):
+            return valid_role
+    # Reworded names such as "Privilege Escalation Expert"
+    match = process.extractOne(
+        stem, _ROLE_STEMS, scorer=fuzz.token_set_ratio, processor=default_process,
+        score_cutoff=_ROLE_MATCH_THRESHOLD,
+    )
+    return VALID_ROLES[match[2]] if match is not None else None
+
+
+@functools.lru_cache(maxsize=1)
+def _encoding():
+    # Loaded on first use: tiktoken downloads the BPE ranks the first time they are needed
+    try:
+        return tiktoken.encoding_for_model("gpt-4o")
+    except Exception as e:
+        print(f"PLANNER: Could not load the gpt-4o tokenizer ({e}), capping logs at {MAX_LOG_CHARS} characters")
+        return None
+
+
+def truncate_log_content(log_content: str, max_tokens: int = MAX_LOG_TOKENS) -> str:
+    """Truncate log content to a token budget without splitting a log record"""
+    encoding = _encoding()
+    if encoding is None:
+        if len(log_content) <= MAX_LOG_CHARS:
+            return log_content
+        truncated = log_content[:MAX_LOG_CHARS]
+    else:
+        # Logs are data, so special-token strings inside them must be encoded as plain text
+        token_ids = encoding.encode(log_content, disallowed_special=())
+        if len(token_ids) <= max_tokens:
+            return log_content
+        truncated = encoding.decode(token_ids[:max_tokens])
+
+    # Back off to the last complete line so records are never cut mid-way
+    last_newline = truncated.rfind("\n")
+    return truncated[:last_newline] if last_newline > 0 else truncated
+
 
 class PlannerOutput(TypedDict):
     plan: str
     worker_definitions: List[Dict[str, str]]
+    log_content_trunc: str
 
 class Planner:
     """
@@ -13,9 +124,9 @@ class Planner:
     """
 
     def __init__(self, llm: ChatOpenAI):
-        self.llm = llm
-        self.prompt = ChatPromptTemplate.from_messages([
-            ("system", """You are a security planning agent specialized in CrowdStrike Falcon log analysis.
+        self.llm = SemanticCachingLLM(llm)
+        # Static system prompt, marked for provider-side prompt caching where supported
+        system_message = SystemMessage(content=cacheable_content("""You are a security planning agent specialized in CrowdStrike Falcon log analysis.
             
             Your task is to:
             1. Interpret a security investigation request
@@ -54,7 +165,9 @@ class Planner:
             5. Defense Evasion Specialist: [specific focus areas and tasks]
             
             IMPORTANT: Use the EXACT role names as listed above. Do not modify them or add any formatting.
-            """),
+            """, self.llm))
+        self.prompt = ChatPromptTemplate.from_messages([
+            system_message,
             ("user", """
             Security Investigation Request: {human_input}
             
@@ -70,9 +183,8 @@ class Planner:
             Remember to use the EXACT role names as provided in the system prompt.
             """)
         ])
-        self.chain = self.prompt | self.llm
 
-    def __call__(self, state: Dict[str, Any]) -> Dict[str, Any]:
+    async def __call__(self, state: Dict[str, Any]) -> PlannerOutput:
         """
         Execute the planner agent.
         """
@@ -80,11 +192,13 @@ class Planner:
         log_content = state.get("log_content", "")
 
         # Generate response
-        response = self.chain.invoke({
+        prompt = self.prompt.invoke({
             "human_input": human_input,
             "log_content": log_content
         })
-        content = response.content
+        # Only the request is embedded; the log preview must match exactly for a semantic hit
+        response = await self.llm.ainvoke(prompt, cache_query=human_input)
+        content = response.text()
 
         # Parse the response to extract plan and worker definitions
         plan_section = ""
@@ -93,45 +207,23 @@ class Planner:
         # Parsing logic
         if "PLAN:" in content and "WORKERS:" in content:
             plan_section = content.split("PLAN:")[1].split("WORKERS:")[0].strip()
-            workers_raw = content.split("WORKERS:")[1].strip()
-            
-            # Parse worker definitions with more robust pattern
-            import re
-            # Updated pattern to better handle role extraction and remove markdown
-            worker_pattern = r'(\d+)\.\s*([^:]+?)(?:\s*:\s*|\s+)(.*?)(?=\d+\.\s*[^:]+:|$)'
-            matches = re.findall(worker_pattern, workers_raw, re.DOTALL)
+            # Strip markdown once up front instead of per match
+            workers_raw = content.split("WORKERS:", 1)[1].strip().translate(_STAR_TBL)
             
-            for _, role, tasks in matches:
-                # Clean up role and tasks - remove any markdown formatting
-                role = re.sub(r'\*+', '', role.strip())  # Remove asterisks
-                tasks = re.sub(r'\*+', '', tasks.strip())  # Remove asterisks
-                
-                # Validate role against known roles
-                valid_roles = [
-                    "Initial Access Specialist",
-                    "Execution Specialist",
-                    "Persistence Specialist",
-                    "Privilege Escalation Specialist",
-                    "Defense Evasion Specialist",
-                    "Credential Access Specialist",
-                    "Discovery Specialist",
-                    "Lateral Movement Specialist",
-                    "Collection Specialist",
-                    "Exfiltration Specialist"
-                ]
+            for match in _WORKER_RE.finditer(workers_raw):
+                role = match.group(2).strip()
+                tasks = match.group(3).strip()
                 
                 # If role doesn't match exactly, try to find the closest match
-                if role not in valid_roles:
-                    # Try to find a role that contains the given role name
-                    for valid_role in valid_roles:
-                        if role.lower() in valid_role.lower():
-                            role = valid_role
-                            print(f"PLANNER: Mapped '{role}' to valid role")
-                            break
+                if role not in _VALID_ROLES:
+                    valid_role = resolve_role(role)
+                    if valid_role is not None:
+                        print(f"PLANNER: Mapped '{role}' to valid role '{valid_role}'")
+                        role = valid_role
                     else:
                         # If no match found, use a default role
                         print(f"PLANNER: Warning - Unknown role '{role}', using default role")
-                        role = "Discovery Specialist"  # Default role
+                        role = DEFAULT_ROLE
                 
                 workers_section.append({
                     "role": role,
@@ -140,18 +232,13 @@ class Planner:
                 
                 print(f"PLANNER: Added worker with role '{role}' and tasks: {tasks[:100]}...")
         
-        # Create result preserving original state where appropriate
-        result = {}
-        
-        # Copy all state except worker-related fields
-        for key, value in state.items():
-            if key not in ["plan", "worker_definitions", "worker1_output", "worker2_output", "worker3_output", 
-                          "worker4_output", "worker5_output", "critique_output"]:
-                result[key] = value
-        
-        # Add new plan and worker definitions
-        result["plan"] = plan_section
-        result["worker_definitions"] = workers_section
+        # Return only the keys the planner produces; LangGraph merges them into the state
+        result: PlannerOutput = {
+            "plan": plan_section,
+            "worker_definitions": workers_section,
+            # Truncate once so all workers send an identical log block
+            "log_content_trunc": truncate_log_content(log_content or ""),
+        }
 
         print(f"PLANNER: Generated new plan with {len(workers_section)} worker definitions")
         print("Worker roles assigned:")
@@ -0,0 +1,47 @@
+"""
+Helpers for marking prompt blocks as cacheable on providers that need it explicitly.
+
+OpenAI caches long prompt prefixes automatically, so for it these helpers return
+plain strings. Anthropic only reuses a prefix up to a block tagged with
+cache_control, and Bedrock's Converse API only up to a cachePoint block; both
+formats are rejected by other providers.
+"""
+
+from typing import Any, Dict, List, Union
+
+# Chat model types (BaseChatModel._llm_type) that accept cache_control blocks
+_CACHE_CONTROL_LLM_TYPES = frozenset({"anthropic-chat"})
+_BEDROCK_CONVERSE_LLM_TYPE = "amazon_bedrock_converse_chat"
+# Bedrock model id fragments of the models that support prompt caching; others reject cachePoint
+_BEDROCK_CACHE_POINT_MODELS = (
+    "claude-3-5-haiku", "claude-3-7-sonnet", "claude-sonnet-4", "claude-opus-4", "claude-haiku-4",
+    "amazon.nova-",
+)
+
+
+def supports_cache_control(llm) -> bool:
+    return getattr(llm, "_llm_type", None) in _CACHE_CONTROL_LLM_TYPES
+
+
+def supports_cache_point(llm) -> bool:
+    if getattr(llm, "_llm_type", None) != _BEDROCK_CONVERSE_LLM_TYPE:
+        return False
+    model_id = getattr(llm, "model_id", None) or ""
+    return any(model in model_id for model in _BEDROCK_CACHE_POINT_MODELS)
+
+
+def cacheable_content(text: str, llm) -> Union[str, List[Dict[str, Any]]]:
+    """Message content for text that should be cached as a prompt prefix"""
+    if supports_cache_control(llm):
+        return [{"type": "text", "text": text, "cache_control": {"type": "ephemeral"}}]
+    if supports_cache_point(llm):
+        # langchain-aws passes blocks without a "type" through to Converse unchanged
+        return [{"type": "text", "text": text}, {"cachePoint": {"type": "default"}}]
+    return text
+
+
+def prefixed_content(shared_prefix: str, suffix: str, llm) -> Union[str, List[Dict[str, Any]]]:
+    """Message content whose shared prefix is cacheable and whose suffix varies per call"""
+    if supports_cache_control(llm) or supports_cache_point(llm):
+        return cacheable_content(shared_prefix, llm) + [{"type": "text", "text": suffix}]
+    return shared_prefix + suffix
@@ -1,110 +1,156 @@
 #!/usr/bin/env python3
 
 import os
+import sys
 import argparse
-import json
+import logging
+import orjson
 import time
 from datetime import datetime
-from main import run_log_analysis
+from main import arun_log_analysis, run_sync
+from agents.worker_factory import WORKER_KEYS
 from utils.visualization import visualize_results
 
-def create_demo_logs():
-    """Create demo log files for different attack scenarios"""
-    demo_dir = "demo_logs"
-    if not os.path.exists(demo_dir):
-        os.makedirs(demo_dir)
-
-    # Define demo scenarios with sample log data
-    scenarios = {
-        "lateral_movement": {
-            "query": "Can you identify any lateral movement or host discovery activities in the logs?",
-            "logs": [
-                {
-                    "timestamp": "2024-03-15T10:34:56Z",
-                    "event": {"type": "ProcessRollup2"},
-                    "process": {
-                        "name": "cmd.exe",
-                        "command_line": "cmd.exe /c net use \\\\10.1.1.12\\admin$ /user:domain\\admin password123",
-                        "pid": 1234
-                    },
-                    "user": {"username": "jsmith"}
+# Define demo scenarios with sample log data
+DEMO_SCENARIOS = {
+    "lateral_movement": {
+        "query": "Can you identify any lateral movement or host discovery activities in the logs?",
+        "logs": [
+            {
+                "timestamp": "2024-03-15T10:34:56Z",
+                "event": {"type": "ProcessRollup2"},
+                "process": {
+                    "name": "cmd.exe",
+                    "command_line": "cmd.exe /c net use \\\\10.1.1.12\\admin$ /user:domain\\admin password123",
+                    "pid": 1234
                 },
-                {
-                    "timestamp": "2024-03-15T10:35:10Z",
-                    "event": {"type": "NetworkConnectionIP4"},
-                    "process": {"name": "cmd.exe", "pid": 1234},
-                    "network": {
-                        "direction": "outbound",
-                        "protocol": "tcp",
-                        "local_ip": "10.1.1.5",
-                        "local_port": 49321,
-                        "remote_ip": "10.1.1.12",
-                        "remote_port": 445
-                    }
+                "user": {"username": "jsmith"}
+            },
+            {
+                "timestamp": "2024-03-15T10:35:10Z",
+                "event": {"type": "NetworkConnectionIP4"},
+                "process": {"name": "cmd.exe", "pid": 1234},
+                "network": {
+                    "direction": "outbound",
+                    "protocol": "tcp",
+                    "local_ip": "10.1.1.5",
+                    "local_port": 49321,
+                    "remote_ip": "10.1.1.12",
+                    "remote_port": 445
                 }
-            ]
-        },
-        "credential_theft": {
-            "query": "Check if there are any credential theft attempts in the logs",
-            "logs": [
-                {
-                    "timestamp": "2024-03-15T11:22:15Z",
-                    "event": {"type": "ProcessRollup2"},
-                    "process": {
-                        "name": "rundll32.exe",
-                        "command_line": "rundll32.exe C:\\Windows\\System32\\comsvcs.dll, MiniDump 624 C:\\temp\\lsass.dmp full",
-                        "pid": 2345
-                    },
-                    "user": {"username": "jsmith"}
+            }
+        ]
+    },
+    "credential_theft": {
+        "query": "Check if there are any credential theft attempts in the logs",
+        "logs": [
+            {
+                "timestamp": "2024-03-15T11:22:15Z",
+                "event": {"type": "ProcessRollup2"},
+                "process": {
+                    "name": "rundll32.exe",
+                    "command_line": "rundll32.exe C:\\Windows\\System32\\comsvcs.dll, MiniDump 624 C:\\temp\\lsass.dmp full",
+                    "pid": 2345
                 },
-                {
-                    "timestamp": "2024-03-15T11:22:18Z",
-                    "event": {"type": "FileWritten"},
-                    "file": {
-                        "path": "C:\\temp\\lsass.dmp",
-                        "size": 45678912
-                    },
-                    "process": {"name": "rundll32.exe", "pid": 2345}
-                }
-            ]
-        },
-        "data_exfiltration": {
-            "query": "Check if there's evidence of data exfiltration in these logs",
-            "logs": [
-                {
-                    "timestamp": "2024-03-15T12:15:30Z",
-                    "event": {"type": "NetworkConnectionIP4"},
-                    "process": {"name": "powershell.exe", "pid": 3456},
-                    "network": {
-                        "direction": "outbound",
-                        "protocol": "tcp",
-                        "local_ip": "10.1.1.5",
-                        "local_port": 54321,
-                        "remote_ip": "45.67.89.123",
-                        "remote_port": 443
-                    }
+                "user": {"username": "jsmith"}
+            },
+            {
+                "timestamp": "2024-03-15T11:22:18Z",
+                "event": {"type": "FileWritten"},
+                "file": {
+                    "path": "C:\\temp\\lsass.dmp",
+                    "size": 45678912
                 },
-                {
-                    "timestamp": "2024-03-15T12:15:35Z",
-                    "event": {"type": "FileWritten"},
-                    "file": {
-                        "path": "C:\\temp\\data.zip",
-                        "size": 1024000
-                    },
-                    "process": {"name": "powershell.exe", "pid": 3456}
+                "process": {"name": "rundll32.exe", "pid": 2345}
+            }
+        ]
+    },
+    "data_exfiltration": {
+        "query": "Check if there's evidence of data exfiltration in these logs",
+        "logs": [
+            {
+                "timestamp": "2024-03-15T12:15:30Z",
+                "event": {"type": "NetworkConnectionIP4"},
+                "process": {"name": "powershell.exe", "pid": 3456},
+                "network": {
+                    "direction": "outbound",
+                    "protocol": "tcp",
+                    "local_ip": "10.1.1.5",
+                    "local_port": 54321,
+                    "remote_ip": "45.67.89.123",
+                    "remote_port": 443
                 }
-            ]
-        }
+            },
+            {
+                "timestamp": "2024-03-15T12:15:35Z",
+                "event": {"type": "FileWritten"},
+                "file": {
+                    "path": "C:\\temp\\data.zip",
+                    "size": 1024000
+                },
+                "process": {"name": "powershell.exe", "pid": 3456}
+            }
+        ]
     }
+}
+
+# Each scenario's logs serialized as NDJSON once per process
+DEMO_LOG_NDJSON = {
+    scenario: b"\n".join(orjson.dumps(log) for log in data["logs"]) + b"\n"
+    for scenario, data in DEMO_SCENARIOS.items()
+}
+
+def create_demo_logs():
+    """Create demo log files for different attack scenarios"""
+    demo_dir = "demo_logs"
+    file_paths = {scenario: os.path.join(demo_dir, f"{scenario}.json") for scenario in DEMO_SCENARIOS}
+
+    # Nothing to do on warm runs
+    if all(os.path.exists(file_path) for file_path in file_paths.values()):
+        return DEMO_SCENARIOS
+
+    if not os.path.exists(demo_dir):
+        os.makedirs(demo_dir)
 
     # Write each scenario to a separate file
-    for scenario, data in scenarios.items():
-        file_path = os.path.join(demo_dir, f"{scenario}.json")
-        with open(file_path, 'w') as f:
-            for log in data["logs"]:
-                f.write(f"{json.dumps(log)}\n")
+    for scenario, file_path in file_paths.items():
+        with open(file_path, 'wb') as f:
+            f.write(DEMO_LOG_NDJSON[scenario])
+
+    return DEMO_SCENARIOS
+
+# Graph nodes whose output is printed token by token, with their section titles
+STREAMED_SECTIONS = {
+    "critique": "VOTING-BASED CONSENSUS",
+    "judge": "FINAL VERDICT & REMEDIATION",
+}
+
+def print_section(title):
+    print("\n" + "="*80)
+    print(title)
+    print("="*80)
 
-    return scenarios
+async def stream_analysis(query, log_file):
+    """
+    Run the analysis, writing critique and judge tokens to stdout as they arrive.
+    Returns the final state and the set of nodes whose output was streamed.
+    """
+    streamed = set()
+
+    def on_token(node, text):
+        if node not in STREAMED_SECTIONS:
+            return
+        if node not in streamed:
+            streamed.add(node)
+            print_section(STREAMED_SECTIONS[node])
+            print()
+        sys.stdout.write(text)
+        sys.stdout.flush()
+
+    result = await arun_log_analysis(query, log_file, on_token=on_token)
+    if streamed:
+        print()
+    return result, streamed
 
 def run_demo(scenario=None):
     """Run a demonstration of the CrowdStrike Falcon anomaly detection system"""
@@ -149,7 +195,7 @@ def run_demo(scenario=None):
 
     # Run the analysis
     start_time = time.time()
-    result = run_log_analysis(selected['query'], selected['log_file'])
+    result, streamed = run_sync(stream_analysis(selected['query'], selected['log_file']))
     end_time = time.time()
 
     # Display results
@@ -163,23 +209,23 @@ def run_demo(scenario=None):
     print(f"{result['plan']}\n")
 
     print("SPECIALIST FINDINGS:")
-    for i in range(1, 6):
-        worker_key = f"worker{i}_output"
-        if worker_key in result:
-            role = result[worker_key]['role']
-            print(f"\n{i}. {role} Analysis:")
-            print("-" * (len(role) + 11))
-            print(f"{result[worker_key]['analysis']}\n")
-
-    print("\n" + "="*80)
-    print("VOTING-BASED CONSENSUS")
-    print("="*80)
-    print(f"\n{result['critique_output']['assessment']}\n")
-
-    print("\n" + "="*80)
-    print("FINAL VERDICT & REMEDIATION")
-    print("="*80)
-    print(f"\n{result['final_judgment']['evaluation']}")
+    for i, key in enumerate(WORKER_KEYS, 1):
+        worker = result.get(key)
+        if worker is None:
+            continue
+        role = worker['role']
+        print(f"\n{i}. {role} Analysis:")
+        print("-" * (len(role) + 11))
+        print(f"{worker['analysis']}\n")
+
+    # Sections already streamed above; cached responses arrive whole and are printed here
+    if "critique" not in streamed:
+        print_section(STREAMED_SECTIONS["critique"])
+        print(f"\n{result['critique_output']['assessment']}\n")
+
+    if "judge" not in streamed:
+        print_section(STREAMED_SECTIONS["judge"])
+        print(f"\n{result['final_judgment']['evaluation']}")
 
     # Create visualization
     print("\nGenerating visualizations...")
@@ -198,4 +244,7 @@ if __name__ == "__main__":
     parser.add_argument("--scenario", type=str, help="Demo scenario to run")
     args = parser.parse_args()
 
+    # LOG_LEVEL=DEBUG shows node START/END markers
+    logging.basicConfig(level=os.getenv("LOG_LEVEL", "WARNING").upper())
+
     run_demo(args.scenario)
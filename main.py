@@ -5,19 +5,25 @@ and parallel worker execution with voting-based consensus.
 """
 
 import os
-import json
+import asyncio
+import atexit
+import functools
+import inspect
+import logging
+import math
+import threading
 import gzip
-from typing import List, Dict, Any, TypedDict, Annotated
+import orjson
+from typing import Callable, List, Dict, Any, Optional, TypedDict, Annotated
 from dotenv import load_dotenv
 from langchain_openai import ChatOpenAI
 from langgraph.graph import StateGraph, END
 from langsmith import traceable
 import argparse
 import random
-from collections import deque
 
 from agents.planner import Planner
-from agents.worker_factory import WorkerFactory
+from agents.worker_factory import WORKER_KEYS, WorkerFactory
 from agents.critique import Critique
 from agents.judge import Judge
 
@@ -25,12 +31,21 @@ from agents.judge import Judge
 # Load environment variables
 load_dotenv()
 
-# Global counter for tracking iterations
-ITERATION_COUNT = 0
+logger = logging.getLogger(__name__)
+
+# Read buffer for uncompressed log files
+READ_BUFFER_SIZE = 1 << 20
+
+# Response length cap for the critique and judge reports
+SUMMARY_MAX_TOKENS = int(os.getenv("LLM_SUMMARY_MAX_TOKENS", "1024"))
+
+# Seed for log sampling, so repeated runs on the same file send identical prompts
+SAMPLE_SEED = 0
 
 class AgentState(TypedDict):
     human_input: str
     log_content: str
+    log_content_trunc: str
     plan: str
     worker_definitions: List[Dict[str, str]]
     worker1_output: Dict[str, Any]
@@ -41,65 +56,101 @@ class AgentState(TypedDict):
     critique_output: Dict[str, Any]
     final_judgment: Dict[str, Any]
     max_iterations: int
-    workers_to_revise: List[int]  # Track which workers need revision
-    iteration_count: int  # Track iteration count in state
+
+
+def create_llm(model_env: str = "LLM_MODEL", max_tokens: Optional[int] = None):
+    """
+    Create a chat model for the agents.
+
+    LLM_PROVIDER selects "openai" (default, ChatOpenAI) or "bedrock" (ChatBedrockConverse,
+    requires langchain-aws); the model_env variable overrides the provider's default model.
+    With LLM_LATENCY_OPTIMIZED=true, requests are routed to the provider's low-latency tier:
+    OpenAI priority processing or Bedrock latency-optimized inference. max_tokens caps the
+    length of each response.
+    """
+    provider = os.getenv("LLM_PROVIDER", "openai")
+    latency_optimized = os.getenv("LLM_LATENCY_OPTIMIZED", "false").lower() == "true"
+
+    if provider == "bedrock":
+        from langchain_aws import ChatBedrockConverse
+        return ChatBedrockConverse(
+            model=os.getenv(model_env) or os.getenv("LLM_MODEL") or "us.anthropic.claude-3-5-haiku-20241022-v1:0",
+            temperature=0.0,
+            max_tokens=max_tokens,
+            performance_config={"latency": "optimized"} if latency_optimized else None,
+        )
+    if provider != "openai":
+        raise ValueError(f"Unsupported LLM_PROVIDER '{provider}', expected 'openai' or 'bedrock'")
+
+    return ChatOpenAI(
+        model=os.getenv(model_env) or os.getenv("LLM_MODEL") or "gpt-4o-mini",
+        temperature=0.0,
+        max_tokens=max_tokens,
+        streaming=True,
+        extra_body={"service_tier": "priority"} if latency_optimized else None,
+    )
 
 
 # Lets create the log analysis graph
 @traceable(name="create_log_analysis_graph")
 def create_log_analysis_graph():
-    # Initialize OpenAI LLM
-    llm = ChatOpenAI(model="gpt-4o-mini", temperature=0.0)
+    # Planner and workers reason over the raw logs; critique and judge condense their
+    # findings into a fixed-shape report, so they get their own model and a length cap
+    llm_reason = create_llm()
+    llm_summary = create_llm("LLM_SUMMARY_MODEL", max_tokens=SUMMARY_MAX_TOKENS)
 
     # Initialize our agents
-    planner = Planner(llm)
-    worker_factory = WorkerFactory(llm)
-    critique = Critique(llm)
-    judge = Judge(llm)
+    planner = Planner(llm_reason)
+    worker_factory = WorkerFactory(llm_reason)
+    critique = Critique(llm_summary)
+    judge = Judge(llm_summary)
 
     # Build the graph with typed state
     workflow = StateGraph(AgentState)
 
     # Debug wrapper for state tracking
     def debug_node(name, func):
+        if inspect.iscoroutinefunction(func) or inspect.iscoroutinefunction(getattr(func, "__call__", None)):
+            async def async_wrapped(state):
+                logger.debug(">>> %s START", name)
+                result = await func(state)
+                logger.debug("<<< %s END", name)
+                return result
+            return async_wrapped
+
         def wrapped(state):
-            print(f"\n>>> {name} START")
+            logger.debug(">>> %s START", name)
             result = func(state)
-            print(f"<<< {name} END")
+            logger.debug("<<< %s END", name)
             return result
         return wrapped
 
     # Add planner node with debug wrapper
     workflow.add_node("planner", debug_node("PLANNER", planner))
     
-    # Define worker creation with debug wrappers
-    def create_worker(num):
-        def worker_func(state):
-            worker_defs = state.get("worker_definitions", [])
-            if len(worker_defs) >= num:
-                worker_def = worker_defs[num - 1]
-                return worker_factory.create_worker(num, worker_def["role"], worker_def["tasks"])(state)
-            return {
-                f"worker{num}_output": {"role": "Default", "analysis": "No specific role defined."}
-            }
-        return debug_node(f"WORKER-{num}", worker_func)
-
-    # Add all 5 worker nodes for parallel execution
-    for i in range(1, 6):
-        workflow.add_node(f"worker{i}", create_worker(i))
+    # Run all workers concurrently inside a single node; they are independent of each other
+    async def _run_workers(state):
+        worker_defs = state.get("worker_definitions", [])
+        workers = [
+            worker_factory.create_worker(num, worker_def["role"], worker_def["tasks"])
+            for num, worker_def in enumerate(worker_defs[:5], 1)
+        ]
+        result = await worker_factory.arun_batch(workers, state)
+
+        # Fill in any worker slots the planner did not define
+        for key in WORKER_KEYS[len(workers):]:
+            result[key] = {"role": "Default", "analysis": "No specific role defined."}
+        return result
+
+    workflow.add_node("workers", debug_node("WORKERS", _run_workers))
     
     # Add critique and judge nodes
     workflow.add_node("critique", debug_node("CRITIQUE", critique))
     workflow.add_node("judge", debug_node("JUDGE", judge))
 
-    # Define edges for parallel execution
-    # Planner to all workers in parallel
-    for i in range(1, 6):
-        workflow.add_edge("planner", f"worker{i}")
-    
-    # All workers to critique in parallel
-    for i in range(1, 6):
-        workflow.add_edge(f"worker{i}", "critique")
+    # Planner fans out to the workers node, which gathers all five before critique
+    workflow.add_edge("planner", "workers")
+    workflow.add_edge("workers", "critique")
     
     # Critique directly to judge (no revision loop)
     workflow.add_edge("critique", "judge")
@@ -113,83 +164,164 @@ def create_log_analysis_graph():
     return workflow.compile()
 
 
-def read_crowdstrike_data(file_path: str, max_events: int = 50) -> str:
+@functools.lru_cache(maxsize=1)
+def get_log_analysis_graph():
+    """
+    Return the compiled log analysis graph, building it on first use.
+
+    Neither the LLM nor the agents depend on the query, so one graph is shared
+    across runs instead of being rebuilt and recompiled for each of them.
+    """
+    return create_log_analysis_graph()
+
+
+# Nested event fields the agents consult: top-level key -> nested keys to keep.
+# Every other top-level key (timestamp, flat Falcon fields, ...) passes through untouched.
+_EVENT_FIELDS = {
+    "event": ("type", "action", "outcome"),
+    "process": ("name", "command_line", "pid", "parent_name", "parent_command_line", "parent_pid"),
+    "file": ("path", "size"),
+    "user": ("username", "domain"),
+    "registry": ("key", "value", "data"),
+    "dns": ("question", "answers"),
+    "auth": ("method", "logon_type", "status"),
+}
+
+
+def _project_event(event: Any) -> Any:
+    """
+    Trim the nested dicts listed in _EVENT_FIELDS down to the keys the agents consult.
+    Other top-level keys are kept as-is, and a nested dict sharing none of the listed
+    keys (e.g. a different export schema) is kept whole.
+    """
+    if not isinstance(event, dict):
+        return event
+    projected = dict(event)
+    for key, nested_keys in _EVENT_FIELDS.items():
+        value = event.get(key)
+        if isinstance(value, dict):
+            trimmed = {nested: value[nested] for nested in nested_keys if nested in value}
+            if trimmed:
+                projected[key] = trimmed
+    return projected
+
+
+def _random_unit(rng: random.Random) -> float:
+    """Uniform random number in (0, 1), safe to take the log of"""
+    u = rng.random()
+    while u == 0.0:
+        u = rng.random()
+    return u
+
+
+def _reservoir_skip(rng: random.Random, w: float) -> int:
+    """Number of events Algorithm L passes over before its next reservoir replacement"""
+    return math.floor(math.log(_random_unit(rng)) / math.log(1.0 - w))
+
+
+def read_crowdstrike_data(file_path: str, max_events: int = 50, seed: Optional[int] = SAMPLE_SEED) -> str:
     """
     Read and parse CrowdStrike SIEM data from a file, either compressed or uncompressed.
     Returns a string with JSON-formatted data for the agents to analyze.
     Randomly samples max_events from the file instead of taking the first max_events.
 
+    With a fixed seed the sample is deterministic, so results are cached per file and
+    reused until the file's modification time or size changes.
+
     Args:
         file_path: Path to the CrowdStrike SIEM data file
         max_events: Maximum number of events to include (to prevent context overflow)
+        seed: Seed for the sampling RNG; None samples differently on every call and skips the cache
 
     Returns:
         String with formatted CrowdStrike data
     """
-    events = deque(maxlen=max_events)
+    try:
+        if seed is None:
+            return _sample_crowdstrike_data.__wrapped__(file_path, 0, 0, max_events, None)
+        stat = os.stat(file_path)
+        return _sample_crowdstrike_data(file_path, stat.st_mtime_ns, stat.st_size, max_events, seed)
+    except Exception as e:
+        print(f"Error reading file {file_path}: {e}")
+        return f"Error reading CrowdStrike data: {e}"
+
+
+@functools.lru_cache(maxsize=32)
+def _sample_crowdstrike_data(file_path: str, mtime_ns: int, size: int, max_events: int,
+                             seed: Optional[int]) -> str:
+    """Sample and format a log file; mtime_ns and size only key the cache"""
+    rng = random.Random(seed)
+    lines = []
     total_events = 0
 
     # Check if file is gzipped
     is_gzipped = file_path.endswith('.gz')
 
-    # Open appropriate file handler
+    # Open appropriate file handler in binary mode; orjson parses the raw UTF-8
+    # bytes itself, so lines skip the text codec layer entirely
     if is_gzipped:
         opener = gzip.open
-        mode = 'rt'  # text mode for gzip
     else:
-        opener = open
-        mode = 'r'
-
-    try:
-        with opener(file_path, mode) as file:
-            # First pass: count total events and collect random sample
-            for line in file:
-                if line.strip():  # Skip empty lines
-                    try:
-                        event = json.loads(line)
-                        total_events += 1
-                        
-                        # Reservoir sampling algorithm
-                        # For the first max_events, add them directly
-                        if total_events <= max_events:
-                            events.append(event)
-                        else:
-                            # For subsequent events, randomly replace existing events
-                            # with probability max_events/total_events
-                            if random.random() < max_events / total_events:
-                                # Randomly select an event to replace
-                                events[random.randrange(max_events)] = event
-                    except json.JSONDecodeError:
-                        print(f"Warning: Could not parse line as JSON: {line[:100]}...")
-                        continue
-
-        print(f"Total events in file: {total_events}")
-        print(f"Randomly sampled {len(events)} events")
-
-    except Exception as e:
-        print(f"Error reading file {file_path}: {e}")
-        return f"Error reading CrowdStrike data: {e}"
-
-    # Convert the events to a well-formatted JSON string
-    return json.dumps(list(events), indent=2)
+        opener = functools.partial(open, buffering=READ_BUFFER_SIZE)
+
+    if max_events <= 0:
+        return "[]"
+
+    # Reservoir sampling with Algorithm L: once the reservoir is full, draw how many
+    # events to skip before the next replacement instead of rolling for every event.
+    # The reservoir holds raw lines, so only the lines that survive to the end are parsed.
+    w = math.exp(math.log(_random_unit(rng)) / max_events)
+    next_replacement = max_events + _reservoir_skip(rng, w) + 1
+
+    with opener(file_path, 'rb') as file:
+        # First pass: count total events and collect random sample
+        for line in file:
+            if line.isspace():  # Skip empty lines
+                continue
+
+            total_events += 1
+            if total_events <= max_events:
+                # For the first max_events, add them directly
+                lines.append(line)
+            elif total_events == next_replacement:
+                # Randomly select an event to replace
+                lines[rng.randrange(max_events)] = line
+                w *= math.exp(math.log(_random_unit(rng)) / max_events)
+                next_replacement += _reservoir_skip(rng, w) + 1
+
+    events = []
+    for line in lines:
+        try:
+            events.append(_project_event(orjson.loads(line)))
+        except orjson.JSONDecodeError:
+            print(f"Warning: Could not parse line as JSON: {line[:100].decode(errors='replace')}...")
+
+    print(f"Total events in file: {total_events}")
+    print(f"Randomly sampled {len(events)} events")
+
+    # Convert the events to a compact JSON array with one event per line; indentation would
+    # roughly double the prompt tokens every worker pays for, and the line breaks let
+    # truncate_log_content cut at event boundaries. Sorted keys keep the prompt text
+    # canonical, so the same events always hit the same LLM cache entries
+    rows = b",\n".join(orjson.dumps(event, option=orjson.OPT_SORT_KEYS) for event in events)
+    return (b"[\n" + rows + b"\n]").decode() if rows else "[]"
 
 
 @traceable(name="log_analysis_multi_agent")
-def run_log_analysis(human_input: str, log_file: str, max_events: int = 50, max_iterations: int = 3):
+async def arun_log_analysis(human_input: str, log_file: str, max_events: int = 50, max_iterations: int = 3,
+                            on_token: Optional[Callable[[str, str], None]] = None):
     """
     Run the log analysis multi-agent system on CrowdStrike SIEM data.
+    Every agent is async, so the graph runs on the caller's event loop.
 
     Args:
         human_input: User query for analysis
         log_file: Path to the CrowdStrike SIEM data file
         max_events: Maximum number of events to include in the analysis
         max_iterations: Maximum number of planning iterations before forcing completion
+        on_token: Called with (node name, token text) for each LLM token as it is generated.
+            Responses served from the semantic cache produce no tokens.
     """
-    global ITERATION_COUNT
-    
-    # Reset the global iteration counter for new runs
-    ITERATION_COUNT = 0
-    
     # Read and parse the CrowdStrike data
     log_content = read_crowdstrike_data(log_file, max_events)
 
@@ -198,27 +330,60 @@ def run_log_analysis(human_input: str, log_file: str, max_events: int = 50, max_
         "human_input": human_input,
         "log_content": log_content,
         "max_iterations": max_iterations,
-        "workers_to_revise": [],  # Initialize empty list of workers to revise
-        "iteration_count": 0      # Initialize iteration count in state
     }
 
-    # Print initial state for debugging
-    print(f"Initial state: global ITERATION_COUNT={ITERATION_COUNT}, max_iterations={max_iterations}")
+    # Log initial state for debugging
+    logger.debug("Initial state: max_iterations=%d", max_iterations)
 
-    log_analysis_graph = create_log_analysis_graph()
+    log_analysis_graph = get_log_analysis_graph()
 
     # Get the final result
-    result = log_analysis_graph.invoke(initial_state)
-
-    # Print final state for debugging
-    print(f"\n=== ANALYSIS COMPLETE ===")
-    print(f"Final iteration count: {ITERATION_COUNT}")
+    if on_token is None:
+        result = await log_analysis_graph.ainvoke(initial_state)
+    else:
+        # Stream LLM tokens alongside the state so callers can render output before the run ends
+        result = None
+        async for mode, payload in log_analysis_graph.astream(initial_state, stream_mode=["messages", "values"]):
+            if mode == "messages":
+                chunk, metadata = payload
+                # text() also covers providers that stream lists of content blocks (Bedrock)
+                text = chunk.text()
+                if text:
+                    on_token(metadata["langgraph_node"], text)
+            else:
+                result = payload
+
+    # Log final state for debugging
+    logger.debug("=== ANALYSIS COMPLETE ===")
 
-    # Add the iteration count to the result
-    result["iteration_count"] = ITERATION_COUNT
-    
     return result
 
+
+# Every synchronous run shares one event loop: the chat models cache their async HTTP
+# clients, and a client reused from a closed loop (or another thread's loop) fails
+_RUNNER = asyncio.Runner()
+_RUNNER_LOCK = threading.RLock()
+atexit.register(_RUNNER.close)
+
+
+def run_sync(coro):
+    """
+    Run a coroutine to completion on the shared event loop.
+
+    Safe to call from several threads: calls are serialized, one run at a time. To run
+    analyses concurrently, await arun_log_analysis from a single event loop instead.
+    """
+    with _RUNNER_LOCK:
+        return _RUNNER.run(coro)
+
+
+def run_log_analysis(human_input: str, log_file: str, max_events: int = 50, max_iterations: int = 3):
+    """
+    Synchronous entry point for arun_log_analysis; runs it on the shared event loop.
+    Thread-safe, but concurrent calls from several threads run one after another.
+    """
+    return run_sync(arun_log_analysis(human_input, log_file, max_events, max_iterations))
+
 def main():
     parser = argparse.ArgumentParser(description="CrowdStrike Falcon Log Anomaly Detection")
     parser.add_argument("--query", type=str, required=True, help="Security investigation request")
@@ -228,6 +393,9 @@ def main():
     
     args = parser.parse_args()
     
+    # LOG_LEVEL=DEBUG shows node START/END markers
+    logging.basicConfig(level=os.getenv("LOG_LEVEL", "WARNING").upper())
+    
     # Run the analysis
     result = run_log_analysis(args.query, args.log_file, args.max_events, args.max_iterations)
     
@@ -237,11 +405,12 @@ def main():
     print(f"Analysis Plan:\n{result['plan']}\n")
     
     # Print worker results
-    for i in range(1, 6):  # Now supporting 5 workers
-        worker_key = f"worker{i}_output"
-        if worker_key in result:
-            print(f"Specialist {i} ({result[worker_key]['role']}):\n")
-            print(f"{result[worker_key]['analysis']}\n")
+    for i, key in enumerate(WORKER_KEYS, 1):  # Now supporting 5 workers
+        worker = result.get(key)
+        if worker is None:
+            continue
+        print(f"Specialist {i} ({worker['role']}):\n")
+        print(f"{worker['analysis']}\n")
     
     # Print critique and judge results
     print(f"Consensus Analysis (with voting):\n{result['critique_output']['assessment']}\n")
@@ -0,0 +1,42 @@
+from main import _project_event
+
+
+def test_nested_schema_is_trimmed_to_consulted_fields():
+    event = {
+        "timestamp": "2025-05-15T08:12:34Z",
+        "event": {"type": "ProcessRollup2", "action": "start", "id": "abc"},
+        "process": {"name": "cmd.exe", "pid": 1234, "parent_name": "explorer.exe", "sha256": "ff" * 32},
+        "registry": {"key": "HKLM\\Software\\Run", "value": "updater", "hive": "HKLM"},
+        "user": {"username": "jsmith", "domain": "CORP", "sid": "S-1-5-21"},
+        "network": {"remote_ip": "10.1.1.12", "remote_port": 445},
+    }
+
+    assert _project_event(event) == {
+        "timestamp": "2025-05-15T08:12:34Z",
+        "event": {"type": "ProcessRollup2", "action": "start"},
+        "process": {"name": "cmd.exe", "pid": 1234, "parent_name": "explorer.exe"},
+        "registry": {"key": "HKLM\\Software\\Run", "value": "updater"},
+        "user": {"username": "jsmith", "domain": "CORP"},
+        "network": {"remote_ip": "10.1.1.12", "remote_port": 445},
+    }
+
+
+def test_flat_falcon_schema_is_kept_whole():
+    event = {
+        "timestamp": "1715760754000",
+        "event_simpleName": "ProcessRollup2",
+        "CommandLine": "powershell.exe -enc SQBFAFgA",
+        "ParentBaseFileName": "winword.exe",
+    }
+
+    assert _project_event(event) == event
+
+
+def test_nested_dict_without_consulted_fields_is_kept_whole():
+    event = {"process": {"ImageFileName": "cmd.exe", "ProcessId": 42}}
+
+    assert _project_event(event) == event
+
+
+def test_non_dict_events_pass_through():
+    assert _project_event(["not", "an", "event"]) == ["not", "an", "event"]
@@ -0,0 +1,71 @@
+import gzip
+from collections import Counter
+
+import orjson
+
+from main import _sample_crowdstrike_data, read_crowdstrike_data
+
+
+def _write_events(path, count, opener=open):
+    with opener(path, "wb") as f:
+        for i in range(count):
+            f.write(orjson.dumps({"timestamp": str(i), "event": {"type": "ProcessRollup2"}}) + b"\n")
+    return str(path)
+
+
+def _sampled_ids(content):
+    return [int(event["timestamp"]) for event in orjson.loads(content)]
+
+
+def test_small_file_is_returned_whole_one_event_per_line(tmp_path):
+    content = read_crowdstrike_data(_write_events(tmp_path / "logs.json", 3), max_events=10)
+
+    assert _sampled_ids(content) == [0, 1, 2]
+    assert content.splitlines()[0] == "["
+    assert len(content.splitlines()) == 5
+
+
+def test_sample_is_distinct_and_deterministic_per_seed(tmp_path):
+    path = _write_events(tmp_path / "logs.json", 500)
+
+    first = _sampled_ids(read_crowdstrike_data(path, max_events=20, seed=7))
+    assert len(first) == len(set(first)) == 20
+    assert all(0 <= i < 500 for i in first)
+    assert _sampled_ids(read_crowdstrike_data(path, max_events=20, seed=7)) == first
+
+
+def test_every_event_is_equally_likely_to_be_sampled(tmp_path):
+    path = _write_events(tmp_path / "logs.json", 20)
+    runs, max_events = 2000, 5
+
+    counts = Counter()
+    for seed in range(runs):
+        counts.update(_sampled_ids(_sample_crowdstrike_data.__wrapped__(path, 0, 0, max_events, seed)))
+
+    expected = runs * max_events / 20
+    assert set(counts) == set(range(20))
+    assert all(abs(count - expected) < 0.2 * expected for count in counts.values())
+
+
+def test_non_positive_max_events_returns_an_empty_sample(tmp_path):
+    path = _write_events(tmp_path / "logs.json", 5)
+
+    assert read_crowdstrike_data(path, max_events=0) == "[]"
+    assert read_crowdstrike_data(path, max_events=-1) == "[]"
+
+
+def test_blank_and_malformed_lines_are_skipped(tmp_path):
+    path = tmp_path / "logs.json"
+    path.write_bytes(b'{"timestamp": "0"}\n\n   \nnot json\n{"timestamp": "1"}\n')
+
+    assert _sampled_ids(read_crowdstrike_data(str(path), max_events=10)) == [0, 1]
+
+
+def test_gzipped_logs_are_read(tmp_path):
+    path = _write_events(tmp_path / "logs.json.gz", 4, opener=gzip.open)
+
+    assert _sampled_ids(read_crowdstrike_data(path, max_events=10)) == [0, 1, 2, 3]
+
+
+def test_missing_file_returns_an_error_message(tmp_path):
+    assert read_crowdstrike_data(str(tmp_path / "missing.json")).startswith("Error reading CrowdStrike data:")
@@ -0,0 +1,73 @@
+import asyncio
+
+import pytest
+from langchain_core.language_models import FakeListChatModel
+
+import agents.planner as planner_module
+from agents.planner import VALID_ROLES, Planner, resolve_role
+from utils.semantic_cache import SemanticCachingLLM
+
+
+@pytest.mark.parametrize("role, expected", [
+    # Exact and differently formatted names
+    ("Initial Access Specialist", "Initial Access Specialist"),
+    ("defense evasion specialist", "Defense Evasion Specialist"),
+    ("lateral-movement", "Lateral Movement Specialist"),
+    # Truncations
+    ("Exfil", "Exfiltration Specialist"),
+    ("Persist", "Persistence Specialist"),
+    ("Collect", "Collection Specialist"),
+    ("Discover", "Discovery Specialist"),
+    ("Credential Access", "Credential Access Specialist"),
+    # Abbreviations
+    ("InitAccess", "Initial Access Specialist"),
+    ("Priv Esc", "Privilege Escalation Specialist"),
+    ("PrivEsc", "Privilege Escalation Specialist"),
+    # Reworded names
+    ("Privilege Escalation Expert", "Privilege Escalation Specialist"),
+    ("Credential Theft Specialist", "Credential Access Specialist"),
+    # Nothing close enough, including unknown "<anything> Specialist" names
+    ("Cloud Storage Analyst", None),
+    ("Cloud Specialist", None),
+    ("Web Specialist", None),
+    ("C2 Specialist", None),
+    ("ICS Specialist", None),
+    ("Recon Specialist", None),
+    ("Specialist", None),
+    ("", None),
+    ("***", None),
+])
+def test_resolve_role(role, expected):
+    assert resolve_role(role) == expected
+
+
+def test_every_valid_role_resolves_to_itself():
+    for role in VALID_ROLES:
+        assert resolve_role(role) == role
+
+
+def test_planner_parses_full_role_names_and_tasks(tmp_path, monkeypatch):
+    # Keep the planner's cache database out of the repository and skip loading an encoder
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(SemanticCachingLLM, "_encode_batch", lambda self, texts: [None] * len(texts))
+    monkeypatch.setattr(planner_module, "_encoding", lambda: None)
+    response = """PLAN: Look for SMB lateral movement.
+
+WORKERS:
+1. **Lateral Movement Specialist**: look at smb to 10.1.1.12
+2. Credential Access Specialist: check lsass access
+3. Discovery: net commands
+4. Cloud Specialist: review cloud logins
+5. PrivEsc : token manipulation"""
+    planner = Planner(FakeListChatModel(responses=[response]))
+
+    result = asyncio.run(planner({"human_input": "Any lateral movement?", "log_content": "[]"}))
+
+    assert result["plan"] == "Look for SMB lateral movement."
+    assert result["worker_definitions"] == [
+        {"role": "Lateral Movement Specialist", "tasks": "look at smb to 10.1.1.12"},
+        {"role": "Credential Access Specialist", "tasks": "check lsass access"},
+        {"role": "Discovery Specialist", "tasks": "net commands"},
+        {"role": planner_module.DEFAULT_ROLE, "tasks": "review cloud logins"},
+        {"role": "Privilege Escalation Specialist", "tasks": "token manipulation"},
+    ]
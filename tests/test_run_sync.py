@@ -0,0 +1,20 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+from main import run_sync
+
+
+async def _loop_id(delay):
+    await asyncio.sleep(delay)
+    return id(asyncio.get_running_loop())
+
+
+def test_calls_reuse_one_event_loop():
+    assert run_sync(_loop_id(0)) == run_sync(_loop_id(0))
+
+
+def test_concurrent_calls_from_several_threads_succeed():
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        loop_ids = list(pool.map(lambda _: run_sync(_loop_id(0.01)), range(8)))
+
+    assert len(set(loop_ids)) == 1
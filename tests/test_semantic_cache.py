@@ -0,0 +1,154 @@
+import asyncio
+import re
+import zlib
+
+import numpy as np
+import pytest
+from langchain_core.language_models import FakeListChatModel
+from langchain_core.messages import HumanMessage, SystemMessage
+
+from utils.semantic_cache import SemanticCachingLLM
+
+
+def _fake_encode_batch(self, texts):
+    """One-hot embeddings of the normalized text: rewordings that only change case or
+    punctuation are identical (cosine 1), anything else is orthogonal (cosine 0)"""
+    vectors = []
+    for text in texts:
+        vector = np.zeros(1024, dtype=np.float32)
+        vector[zlib.crc32(" ".join(re.findall(r"\w+", text.lower())).encode()) % 1024] = 1.0
+        vectors.append(vector)
+    return vectors
+
+
+@pytest.fixture(autouse=True)
+def fake_encoder(monkeypatch):
+    monkeypatch.setattr(SemanticCachingLLM, "_encode_batch", _fake_encode_batch)
+
+
+def _cache(tmp_path, responses=("first", "second", "third"), **kwargs):
+    llm = FakeListChatModel(responses=list(responses))
+    return SemanticCachingLLM(llm, db_path=str(tmp_path / "cache.db"), **kwargs)
+
+
+def _prompt(query, log="cmd.exe /c net use"):
+    return [SystemMessage(content="You analyze logs."), HumanMessage(content=f"Logs: {log}\nRequest: {query}")]
+
+
+def _ask(cache, query, log="cmd.exe /c net use"):
+    return asyncio.run(cache.ainvoke(_prompt(query, log), cache_query=query)).content
+
+
+def test_exact_repeat_is_served_from_cache(tmp_path):
+    cache = _cache(tmp_path)
+    assert _ask(cache, "Any lateral movement?") == "first"
+    assert _ask(cache, "Any lateral movement?") == "first"
+
+
+def test_reworded_request_on_same_logs_is_a_semantic_hit(tmp_path):
+    cache = _cache(tmp_path)
+    assert _ask(cache, "Any lateral movement?") == "first"
+    assert _ask(cache, "any LATERAL movement") == "first"
+
+
+def test_different_request_on_same_logs_misses(tmp_path):
+    cache = _cache(tmp_path)
+    assert _ask(cache, "Any lateral movement?") == "first"
+    assert _ask(cache, "Any data exfiltration?") == "second"
+
+
+def test_same_request_on_different_logs_misses(tmp_path):
+    cache = _cache(tmp_path)
+    assert _ask(cache, "Any lateral movement?") == "first"
+    assert _ask(cache, "any lateral movement", log="rundll32.exe comsvcs.dll MiniDump") == "second"
+
+
+def test_calls_without_cache_query_only_match_exactly(tmp_path):
+    cache = _cache(tmp_path)
+    first = asyncio.run(cache.ainvoke(_prompt("Any lateral movement?")))
+    reworded = asyncio.run(cache.ainvoke(_prompt("any lateral movement")))
+    assert (first.content, reworded.content) == ("first", "second")
+
+
+def test_entries_persist_across_instances(tmp_path):
+    assert _ask(_cache(tmp_path), "Any lateral movement?") == "first"
+    assert _ask(_cache(tmp_path), "any lateral movement") == "first"
+
+
+def test_entries_are_not_shared_across_models(tmp_path):
+    assert _ask(_cache(tmp_path, responses=["model a"]), "Any lateral movement?") == "model a"
+    assert _ask(_cache(tmp_path, responses=["model b"]), "Any lateral movement?") == "model b"
+
+
+def test_exact_mode_skips_semantic_lookups(tmp_path):
+    cache = _cache(tmp_path, mode="exact")
+    assert _ask(cache, "Any lateral movement?") == "first"
+    assert _ask(cache, "Any lateral movement?") == "first"
+    assert _ask(cache, "any lateral movement") == "second"
+
+
+def test_off_mode_bypasses_the_cache(tmp_path):
+    cache = _cache(tmp_path, mode="off")
+    assert _ask(cache, "Any lateral movement?") == "first"
+    assert _ask(cache, "Any lateral movement?") == "second"
+    assert not (tmp_path / "cache.db").exists()
+
+
+def test_unknown_mode_is_rejected(tmp_path):
+    with pytest.raises(ValueError):
+        _cache(tmp_path, mode="sometimes")
+
+
+def test_abatch_sends_only_misses_to_the_model(tmp_path):
+    cache = _cache(tmp_path)
+    assert _ask(cache, "Any lateral movement?") == "first"
+
+    prompts = [_prompt("Any lateral movement?"), _prompt("Any lateral movement?", log="powershell.exe -enc")]
+    responses = asyncio.run(cache.abatch(prompts, cache_query="Any lateral movement?"))
+    assert [response.content for response in responses] == ["first", "second"]
+
+
+def test_astream_caches_the_streamed_response(tmp_path):
+    cache = _cache(tmp_path, responses=["streamed answer", "fresh answer"])
+
+    async def stream(query):
+        return "".join([chunk.content async for chunk in cache.astream(_prompt(query), cache_query=query)])
+
+    assert asyncio.run(stream("Any lateral movement?")) == "streamed answer"
+    assert asyncio.run(stream("any lateral movement")) == "streamed answer"
+
+
+def test_embedding_failure_falls_back_to_the_model(tmp_path, monkeypatch):
+    def unreachable(self, texts):
+        raise ConnectionError("embeddings API unreachable")
+
+    monkeypatch.setattr(SemanticCachingLLM, "_encode_batch", unreachable)
+    cache = _cache(tmp_path)
+    assert _ask(cache, "Any lateral movement?") == "first"
+    # Stored for exact matches only
+    assert _ask(cache, "Any lateral movement?") == "first"
+    assert _ask(cache, "any lateral movement") == "second"
+
+
+def test_store_failure_falls_back_to_the_model(tmp_path):
+    cache = _cache(tmp_path)
+    cache._conn.close()
+    assert _ask(cache, "Any lateral movement?") == "first"
+    assert _ask(cache, "Any data exfiltration?") == "second"
+
+
+def test_invoke_is_cached(tmp_path):
+    cache = _cache(tmp_path)
+    assert cache.invoke(_prompt("Any lateral movement?"), cache_query="Any lateral movement?").content == "first"
+    assert cache.invoke(_prompt("any lateral movement"), cache_query="any lateral movement").content == "first"
+    # Shared with the async entry points
+    assert _ask(cache, "Any lateral movement?") == "first"
+
+
+@pytest.mark.parametrize("name", ["batch", "stream", "astream_events"])
+def test_uncached_entry_points_are_not_forwarded(tmp_path, name):
+    cache = _cache(tmp_path)
+    with pytest.raises(AttributeError):
+        getattr(cache, name)
+    # Plain attributes still come from the wrapped model
+    assert cache.responses == ["first", "second", "third"]
@@ -0,0 +1,66 @@
+import asyncio
+from typing import Any, Iterator, List, Optional
+
+import pytest
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+import agents.judge as judge_module
+from agents.critique import Critique
+from agents.judge import Judge
+from utils.semantic_cache import SemanticCachingLLM
+
+
+class ConverseStyleChatModel(BaseChatModel):
+    """Streams its reply as lists of content blocks, the way ChatBedrockConverse does"""
+
+    reply: str
+
+    @property
+    def _llm_type(self) -> str:
+        return "converse-style-fake"
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                  run_manager=None, **kwargs: Any) -> ChatResult:
+        return ChatResult(generations=[ChatGeneration(
+            message=AIMessage(content=[{"type": "text", "text": self.reply}])
+        )])
+
+    def _stream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                run_manager=None, **kwargs: Any) -> Iterator[ChatGenerationChunk]:
+        for word in self.reply.split(" "):
+            yield ChatGenerationChunk(
+                message=AIMessageChunk(content=[{"type": "text", "text": word + " ", "index": 0}])
+            )
+
+
+@pytest.fixture(autouse=True)
+def isolated_cache(tmp_path, monkeypatch):
+    # Keep the agents' cache database out of the repository and skip loading an encoder
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(SemanticCachingLLM, "_encode_batch", lambda self, texts: [None] * len(texts))
+
+
+STATE = {
+    "human_input": "Any lateral movement?",
+    "plan": "Check SMB connections",
+    "worker1_output": {"role": "Lateral Movement Specialist", "analysis": "net use to 10.1.1.12"},
+}
+
+
+def test_critique_joins_streamed_content_blocks():
+    critique = Critique(ConverseStyleChatModel(reply="HIGH CONFIDENCE lateral movement"))
+
+    result = asyncio.run(critique(STATE))
+
+    assert result["critique_output"]["assessment"] == "HIGH CONFIDENCE lateral movement "
+
+
+def test_judge_joins_streamed_content_blocks(monkeypatch):
+    monkeypatch.setattr(judge_module._TELEMETRY_EXECUTOR, "submit", lambda *args, **kwargs: None)
+    judge = Judge(ConverseStyleChatModel(reply="VERDICT: incident"))
+
+    result = asyncio.run(judge({**STATE, "critique_output": {"assessment": "HIGH CONFIDENCE"}}))
+
+    assert result["final_judgment"]["evaluation"] == "VERDICT: incident "
@@ -0,0 +1,86 @@
+import xml.etree.ElementTree as ET
+
+import matplotlib
+import numpy as np
+from matplotlib.colors import to_hex
+
+from utils.svg_charts import attack_graph_svg, bar_chart_svg, pastel_colors, pie_chart_svg
+
+_SVG = "{http://www.w3.org/2000/svg}"
+
+
+def _parse(path):
+    root = ET.parse(path).getroot()
+    assert root.tag == f"{_SVG}svg"
+    return root
+
+
+def _texts(root):
+    return [element.text for element in root.iter(f"{_SVG}text")]
+
+
+def test_attack_graph_draws_a_node_per_name_and_an_edge_between_each(tmp_path):
+    names = ["cmd.exe", "net use", "10.1.1.12:445"]
+    root = _parse(attack_graph_svg(names, "Attack <Path>", str(tmp_path / "graph.svg")))
+
+    circles = list(root.iter(f"{_SVG}circle"))
+    assert len(circles) == 3
+    assert circles[0].get("fill") == "lightgreen"
+    assert len(list(root.iter(f"{_SVG}line"))) == 2
+    assert _texts(root) == ["Attack <Path>", *names]
+
+
+def test_attack_graph_widens_for_long_labels(tmp_path):
+    root = _parse(attack_graph_svg(["x" * 200], "Title", str(tmp_path / "graph.svg")))
+
+    assert int(root.get("width")) > 700
+
+
+def test_bar_chart_scales_bars_to_the_largest_count(tmp_path):
+    root = _parse(bar_chart_svg(["High", "Medium", "Low"], [4, 2, 0], ["red", "orange", "green"],
+                                "Findings", "Confidence", "Count", str(tmp_path / "bars.svg")))
+
+    heights = [float(rect.get("height")) for rect in root.iter(f"{_SVG}rect")][1:]
+    assert heights[0] == 2 * heights[1] and heights[2] == 0
+    assert {"Findings", "Confidence", "Count", "High", "Medium", "Low"} <= set(_texts(root))
+
+
+def test_bar_chart_handles_no_data(tmp_path):
+    root = _parse(bar_chart_svg([], [], [], "Findings", "Confidence", "Count", str(tmp_path / "bars.svg")))
+
+    assert "Findings" in _texts(root)
+
+
+def test_pie_chart_labels_each_wedge_with_its_share(tmp_path):
+    root = _parse(pie_chart_svg(["Discovery", "Execution"], [3, 1], "Contributions", str(tmp_path / "pie.svg")))
+
+    wedges = list(root.iter(f"{_SVG}path"))
+    assert [wedge.get("fill") for wedge in wedges] == pastel_colors(2)
+    assert {"75.0%", "25.0%", "Discovery", "Execution"} <= set(_texts(root))
+    # Counter-clockwise from 12 o'clock like matplotlib, so the larger wedge's label is on the left
+    labels = {element.text: element for element in root.iter(f"{_SVG}text")}
+    assert float(labels["Discovery"].get("x")) < 450 < float(labels["Execution"].get("x"))
+
+
+def test_pie_colors_match_the_matplotlib_palette_sampling():
+    pastel1 = matplotlib.colormaps["Pastel1"]
+    for n in range(1, 12):
+        assert pastel_colors(n) == [to_hex(color) for color in pastel1(np.linspace(0, 1, n))]
+
+
+def test_pie_chart_offsets_exploded_wedges(tmp_path):
+    plain = _parse(pie_chart_svg(["A", "B"], [1, 1], "Title", str(tmp_path / "plain.svg")))
+    exploded = _parse(pie_chart_svg(["A", "B"], [1, 1], "Title", str(tmp_path / "exploded.svg"), explode=[0.1, 0]))
+
+    def starts(root):
+        return [wedge.get("d").split(" ")[0] for wedge in root.iter(f"{_SVG}path")]
+
+    assert starts(plain) == ["M450.0,300.0", "M450.0,300.0"]
+    assert starts(exploded)[0] != "M450.0,300.0" and starts(exploded)[1] == "M450.0,300.0"
+
+
+def test_pie_chart_with_a_single_slice_draws_a_full_circle(tmp_path):
+    root = _parse(pie_chart_svg(["Discovery"], [5], "Contributions", str(tmp_path / "pie.svg")))
+
+    assert len(list(root.iter(f"{_SVG}circle"))) == 1
+    assert "100.0%" in _texts(root)
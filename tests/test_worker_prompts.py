@@ -0,0 +1,29 @@
+from langchain_core.language_models import FakeListChatModel
+
+from agents.planner import VALID_ROLES
+from agents.worker_factory import WorkerFactory
+from utils.semantic_cache import SemanticCachingLLM
+
+STATE = {
+    "log_content_trunc": '{"event_simpleName": "ProcessRollup2", "CommandLine": "net use \\\\10.1.1.12"}',
+    "human_input": "Any lateral movement?",
+    "plan": "Check SMB connections",
+}
+
+
+def test_workers_share_everything_before_the_role_briefing(tmp_path, monkeypatch):
+    # Keep the workers' cache database out of the repository and skip loading an encoder
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(SemanticCachingLLM, "_encode_batch", lambda self, texts: [None] * len(texts))
+    factory = WorkerFactory(FakeListChatModel(responses=["ok"]))
+    workers = [factory.create_worker(i, role, f"tasks for {role}") for i, role in enumerate(VALID_ROLES[:5], 1)]
+
+    prompts = [worker.build_messages(STATE) for worker in workers]
+
+    assert len({prompt[0].content for prompt in prompts}) == 1
+    log_position = prompts[0][1].content.index(STATE["log_content_trunc"])
+    shared_prefix = prompts[0][1].content[:prompts[0][1].content.index("Your Security Specialty")]
+    assert log_position < len(shared_prefix) and STATE["plan"] in shared_prefix
+    for worker, prompt in zip(workers, prompts):
+        assert prompt[1].content.startswith(shared_prefix)
+        assert worker.role_prompt in prompt[1].content[len(shared_prefix):]
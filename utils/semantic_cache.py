@@ -0,0 +1,452 @@
+"""
+Semantic response cache wrapped around the chat model shared by the agents.
+
+Analysts tend to re-run the same investigation with differently worded
+questions, so responses are cached per system prompt and prompt context (log
+sample, plan, ...) -- the "cluster" -- and looked up by the cosine similarity
+of the embedded question.
+
+SEMANTIC_CACHE=off bypasses the cache entirely; SEMANTIC_CACHE=exact keeps only
+exact-match lookups.
+"""
+
+import asyncio
+import functools
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, AsyncIterator, Callable, Dict, List, Literal, Optional, Tuple
+
+import numpy as np
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.prompt_values import PromptValue
+
+DEFAULT_CACHE_PATH = os.getenv("SEMANTIC_CACHE_PATH", ".semantic_cache.db")
+# "on" (exact + semantic lookups), "exact" (exact-match lookups only) or "off"
+DEFAULT_CACHE_MODE = os.getenv("SEMANTIC_CACHE", "on").lower()
+DEFAULT_SIMILARITY_THRESHOLD = 0.92
+# "local" embeds in-process with no network hop per cache check; "openai" calls the embeddings API
+DEFAULT_EMBEDDING_BACKEND = os.getenv("SEMANTIC_CACHE_EMBEDDINGS", "local")
+DEFAULT_EMBEDDING_MODELS = {
+    "local": "sentence-transformers/all-MiniLM-L6-v2",
+    "openai": "text-embedding-3-small",
+}
+EXACT_CACHE_SIZE = 1024
+# Embedding micro-batches: flush at this many texts or after this many seconds
+EMBEDDING_BATCH_SIZE = 32
+EMBEDDING_BATCH_WAIT = 0.005
+
+try:
+    import faiss
+except ImportError:  # numpy brute-force search gives identical results on small stores
+    faiss = None
+
+
+@functools.lru_cache(maxsize=None)
+def _load_encoder(model_name: str):
+    """Load a SentenceTransformer once per process; returns None if it is not installed"""
+    try:
+        from sentence_transformers import SentenceTransformer
+    except ImportError:
+        print("SEMANTIC CACHE: sentence-transformers not installed, falling back to exact-match caching")
+        return None
+    try:
+        return SentenceTransformer(model_name)
+    except Exception as e:  # e.g. the model cannot be downloaded offline
+        print(f"SEMANTIC CACHE: Could not load {model_name} ({e}), falling back to exact-match caching")
+        return None
+
+
+@functools.lru_cache(maxsize=None)
+def _load_openai_embeddings(model_name: str):
+    from langchain_openai import OpenAIEmbeddings
+    return OpenAIEmbeddings(model=model_name)
+
+
+def _hash(*parts: str) -> str:
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\x00")
+    return digest.hexdigest()
+
+
+def _llm_string(llm) -> str:
+    """Stable description of the model and its parameters, so entries never cross models"""
+    try:
+        # The same identity LangChain's own LLM caches key on (class, model, max_tokens, ...)
+        return llm._get_llm_string()
+    except Exception:
+        params = {name: getattr(llm, name, None) for name in ("model_name", "model", "model_id", "max_tokens", "temperature")}
+        return f"{getattr(llm, '_llm_type', type(llm).__name__)}:{sorted(params.items())!r}"
+
+
+def _message_text(message: BaseMessage) -> str:
+    if isinstance(message.content, str):
+        return message.content
+    return "".join(
+        block if isinstance(block, str) else block.get("text", "")
+        for block in message.content
+    )
+
+
+def _split_prompt(messages: Any) -> Tuple[str, str]:
+    """Split a prompt into its system text and the remaining (user) text"""
+    if isinstance(messages, PromptValue):
+        messages = messages.to_messages()
+    system = "\n".join(_message_text(m) for m in messages if m.type == "system")
+    user = "\n".join(_message_text(m) for m in messages if m.type != "system")
+    return system, user
+
+
+class _ClusterIndex:
+    """Inner-product index over normalized embeddings for a single system prompt"""
+
+    def __init__(self, dim: int):
+        self.responses: List[str] = []
+        if faiss is not None:
+            self.index = faiss.IndexFlatIP(dim)
+        else:
+            self.vectors = np.empty((0, dim), dtype=np.float32)
+
+    def add(self, embedding: np.ndarray, response: str):
+        vector = embedding.reshape(1, -1).astype(np.float32)
+        if faiss is not None:
+            self.index.add(vector)
+        else:
+            self.vectors = np.vstack([self.vectors, vector])
+        self.responses.append(response)
+
+    def search(self, embedding: np.ndarray) -> Tuple[float, Optional[str]]:
+        if not self.responses:
+            return 0.0, None
+        vector = embedding.reshape(1, -1).astype(np.float32)
+        if faiss is not None:
+            scores, ids = self.index.search(vector, 1)
+            return float(scores[0][0]), self.responses[int(ids[0][0])]
+        scores = self.vectors @ vector[0]
+        best = int(np.argmax(scores))
+        return float(scores[best]), self.responses[best]
+
+
+class _EmbeddingBatcher:
+    """
+    Coalesces concurrent embedding requests into micro-batches.
+
+    Encoders reach their throughput only on batches, so requests queue up and a
+    background task flushes them together once EMBEDDING_BATCH_SIZE texts are
+    waiting or EMBEDDING_BATCH_WAIT has elapsed since the first one arrived.
+    """
+
+    def __init__(self, encode_batch: Callable[[List[str]], List[Optional[np.ndarray]]]):
+        self._encode_batch = encode_batch
+        self._loop = None
+        self._queue = None
+
+    async def embed(self, text: str) -> Optional[np.ndarray]:
+        loop = asyncio.get_running_loop()
+        # Queues are bound to their event loop, so a caller on a different loop gets a fresh one
+        if self._loop is not loop:
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            loop.create_task(self._flush_forever(self._queue))
+
+        future = loop.create_future()
+        await self._queue.put((text, future))
+        return await future
+
+    async def _flush_forever(self, queue: asyncio.Queue):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await queue.get()]
+            deadline = loop.time() + EMBEDDING_BATCH_WAIT
+            while len(batch) < EMBEDDING_BATCH_SIZE:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            try:
+                vectors = await asyncio.to_thread(self._encode_batch, [text for text, _ in batch])
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            for (_, future), vector in zip(batch, vectors):
+                if not future.done():
+                    future.set_result(vector)
+
+
+# Runnable entry points of the wrapped model that this wrapper does not implement
+_UNCACHED_ENTRY_POINTS = frozenset({
+    "batch", "stream", "batch_as_completed", "abatch_as_completed",
+    "transform", "atransform", "astream_log", "astream_events",
+})
+
+
+class SemanticCachingLLM:
+    """
+    Wraps a chat model and short-circuits calls whose prompt is identical or
+    semantically close (cosine >= threshold) to a previously answered one.
+
+    Lookups go: in-memory exact match -> persisted exact match -> embedding search
+    within the cluster of entries sharing the same system prompt and the same user
+    message apart from the question. Callers name the question with cache_query;
+    only it is embedded, so the log sample and templates cannot dominate similarity
+    and a different question about the same logs is never served a stale answer.
+    Calls without a cache_query use exact matching only.
+    Both keys include the wrapped model and its parameters, so a different model
+    or max_tokens never reuses another configuration's answers.
+    """
+
+    def __init__(self, llm, threshold: float = DEFAULT_SIMILARITY_THRESHOLD,
+                 db_path: str = DEFAULT_CACHE_PATH,
+                 embedding_backend: Literal["local", "openai"] = DEFAULT_EMBEDDING_BACKEND,
+                 embedding_model: Optional[str] = None,
+                 mode: Literal["on", "exact", "off"] = DEFAULT_CACHE_MODE):
+        if embedding_backend not in DEFAULT_EMBEDDING_MODELS:
+            raise ValueError(f"Unknown embedding backend '{embedding_backend}', expected 'local' or 'openai'")
+        if mode not in ("on", "exact", "off"):
+            raise ValueError(f"Unknown semantic cache mode '{mode}', expected 'on', 'exact' or 'off'")
+        self.llm = llm
+        self.mode = mode
+        self.llm_string = _llm_string(llm)
+        self.threshold = threshold
+        self.embedding_backend = embedding_backend
+        # Part of every cluster id, so entries embedded by different models never get compared
+        self.embedding_model = embedding_model or DEFAULT_EMBEDDING_MODELS[embedding_backend]
+        self._exact: "OrderedDict[str, str]" = OrderedDict()
+        self._clusters: Dict[str, _ClusterIndex] = {}
+        self._lock = threading.Lock()
+        self._batcher = _EmbeddingBatcher(self._encode_batch)
+        if mode == "off":
+            return
+
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS semantic_cache (
+                cluster_id TEXT NOT NULL,
+                prompt_hash TEXT NOT NULL,
+                embedding BLOB,
+                response TEXT NOT NULL,
+                ts REAL NOT NULL
+            )"""
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_semantic_cache_prompt ON semantic_cache (prompt_hash)")
+        self._conn.commit()
+        self._load_clusters()
+
+    def __getattr__(self, name: str):
+        # Expose the wrapped model's attributes (model_name, _llm_type, ...) unchanged
+        if name == "llm":
+            raise AttributeError(name)
+        # Forwarding these would silently bypass the cache
+        if name in _UNCACHED_ENTRY_POINTS:
+            raise AttributeError(
+                f"SemanticCachingLLM does not cache '{name}'; use invoke, ainvoke, abatch or astream"
+            )
+        return getattr(self.llm, name)
+
+    def _load_clusters(self):
+        """Rebuild the in-memory indexes from the persisted store"""
+        rows = self._conn.execute(
+            "SELECT cluster_id, embedding, response FROM semantic_cache WHERE embedding IS NOT NULL ORDER BY ts"
+        )
+        for cluster_id, blob, response in rows:
+            embedding = np.frombuffer(blob, dtype=np.float32)
+            self._cluster(cluster_id, embedding.shape[0]).add(embedding, response)
+
+    def _cluster(self, cluster_id: str, dim: int) -> _ClusterIndex:
+        if cluster_id not in self._clusters:
+            self._clusters[cluster_id] = _ClusterIndex(dim)
+        return self._clusters[cluster_id]
+
+    def _encode_batch(self, texts: List[str]) -> List[Optional[np.ndarray]]:
+        if self.embedding_backend == "openai":
+            vectors = np.asarray(_load_openai_embeddings(self.embedding_model).embed_documents(texts), dtype=np.float32)
+            return list(vectors / np.linalg.norm(vectors, axis=1, keepdims=True))
+
+        encoder = _load_encoder(self.embedding_model)
+        if encoder is None:
+            return [None] * len(texts)
+        vectors = encoder.encode(
+            texts, batch_size=EMBEDDING_BATCH_SIZE, convert_to_numpy=True, normalize_embeddings=True
+        )
+        return list(vectors.astype(np.float32))
+
+    def _remember(self, prompt_hash: str, response: str):
+        self._exact[prompt_hash] = response
+        self._exact.move_to_end(prompt_hash)
+        if len(self._exact) > EXACT_CACHE_SIZE:
+            self._exact.popitem(last=False)
+
+    def _exact_lookup(self, prompt_hash: str) -> Optional[str]:
+        with self._lock:
+            if prompt_hash in self._exact:
+                self._exact.move_to_end(prompt_hash)
+                return self._exact[prompt_hash]
+            row = self._conn.execute(
+                "SELECT response FROM semantic_cache WHERE prompt_hash = ? LIMIT 1", (prompt_hash,)
+            ).fetchone()
+            if row is not None:
+                self._remember(prompt_hash, row[0])
+                return row[0]
+        return None
+
+    def _semantic_lookup(self, cluster_id: str, prompt_hash: str,
+                         embedding: Optional[np.ndarray]) -> Tuple[Optional[str], Dict[str, Any]]:
+        """Return (cached_response, pending_entry); pending_entry is what _store needs on a miss"""
+        pending = {"cluster_id": cluster_id, "prompt_hash": prompt_hash, "embedding": embedding}
+        if embedding is None:
+            return None, pending
+
+        with self._lock:
+            cluster = self._clusters.get(cluster_id)
+            if cluster is not None:
+                score, response = cluster.search(embedding)
+                if response is not None and score >= self.threshold:
+                    print(f"SEMANTIC CACHE: Hit (similarity {score:.3f})")
+                    return response, {}
+        return None, pending
+
+    def _keys(self, input: Any, query: Optional[str]) -> Tuple[str, Optional[str]]:
+        """Return (prompt_hash, cluster_id); cluster_id is None when only exact matches apply"""
+        system, user = _split_prompt(input)
+        prompt_hash = _hash(self.llm_string, system, user)
+        if self.mode == "exact" or not query or query not in user:
+            return prompt_hash, None
+        # Everything but the question must match exactly for a semantic hit
+        context = user.replace(query, "", 1)
+        return prompt_hash, _hash(self.llm_string, self.embedding_model, system, context)
+
+    def _safe_exact_lookup(self, prompt_hash: str) -> Optional[str]:
+        try:
+            return self._exact_lookup(prompt_hash)
+        except sqlite3.Error as e:
+            # The cache only saves calls; a failing store must never fail the analysis
+            print(f"SEMANTIC CACHE: Lookup failed ({e}), treating as a miss")
+            return None
+
+    def _lookup(self, input: Any, query: Optional[str]) -> Tuple[Optional[str], Dict[str, Any]]:
+        prompt_hash, cluster_id = self._keys(input, query)
+        cached = self._safe_exact_lookup(prompt_hash)
+        if cached is not None:
+            return cached, {}
+        if cluster_id is None:
+            # Stored without an embedding, so the entry only ever serves exact matches
+            return self._semantic_lookup("", prompt_hash, None)
+        try:
+            embedding = self._encode_batch([query])[0]
+        except Exception as e:  # e.g. the embeddings API is rate limited or unreachable
+            print(f"SEMANTIC CACHE: Embedding failed ({e}), caching this prompt for exact matches only")
+            return self._semantic_lookup("", prompt_hash, None)
+        return self._semantic_lookup(cluster_id, prompt_hash, embedding)
+
+    async def _alookup(self, input: Any, query: Optional[str]) -> Tuple[Optional[str], Dict[str, Any]]:
+        prompt_hash, cluster_id = self._keys(input, query)
+        # sqlite access is blocking, keep it off the event loop
+        cached = await asyncio.to_thread(self._safe_exact_lookup, prompt_hash)
+        if cached is not None:
+            return cached, {}
+        if cluster_id is None:
+            # Stored without an embedding, so the entry only ever serves exact matches
+            return self._semantic_lookup("", prompt_hash, None)
+        # Concurrent callers (e.g. the five workers) are embedded together in one micro-batch
+        try:
+            embedding = await self._batcher.embed(query)
+        except Exception as e:  # e.g. the embeddings API is rate limited or unreachable
+            print(f"SEMANTIC CACHE: Embedding failed ({e}), caching this prompt for exact matches only")
+            return self._semantic_lookup("", prompt_hash, None)
+        return self._semantic_lookup(cluster_id, prompt_hash, embedding)
+
+    def _store(self, pending: Dict[str, Any], response: str):
+        if not pending:
+            return
+        embedding = pending["embedding"]
+        with self._lock:
+            try:
+                self._conn.execute(
+                    "INSERT INTO semantic_cache (cluster_id, prompt_hash, embedding, response, ts) VALUES (?, ?, ?, ?, ?)",
+                    (
+                        pending["cluster_id"],
+                        pending["prompt_hash"],
+                        embedding.tobytes() if embedding is not None else None,
+                        response,
+                        time.time(),
+                    ),
+                )
+                self._conn.commit()
+            except sqlite3.Error as e:
+                # The response is already in hand; keep it in memory and carry on
+                print(f"SEMANTIC CACHE: Could not persist entry ({e})")
+            self._remember(pending["prompt_hash"], response)
+            if embedding is not None:
+                self._cluster(pending["cluster_id"], embedding.shape[0]).add(embedding, response)
+
+    def invoke(self, input: Any, config: Optional[Dict[str, Any]] = None, *,
+               cache_query: Optional[str] = None, **kwargs) -> BaseMessage:
+        if self.mode == "off":
+            return self.llm.invoke(input, config, **kwargs)
+
+        cached, pending = self._lookup(input, cache_query)
+        if cached is not None:
+            return AIMessage(content=cached)
+
+        response = self.llm.invoke(input, config, **kwargs)
+        self._store(pending, _message_text(response))
+        return response
+
+    async def abatch(self, inputs: List[Any], config: Optional[Dict[str, Any]] = None, *,
+                     cache_query: Optional[str] = None, **kwargs) -> List[BaseMessage]:
+        """Look every prompt up concurrently and send only the misses to the model as one batch"""
+        if self.mode == "off":
+            return await self.llm.abatch(inputs, config, **kwargs)
+
+        lookups = await asyncio.gather(*(self._alookup(prompt, cache_query) for prompt in inputs))
+        responses = [AIMessage(content=cached) if cached is not None else None for cached, _ in lookups]
+
+        misses = [i for i, (cached, _) in enumerate(lookups) if cached is None]
+        if misses:
+            fresh = await self.llm.abatch([inputs[i] for i in misses], config, **kwargs)
+            for i, response in zip(misses, fresh):
+                await asyncio.to_thread(self._store, lookups[i][1], _message_text(response))
+                responses[i] = response
+        return responses
+
+    async def ainvoke(self, input: Any, config: Optional[Dict[str, Any]] = None, *,
+                      cache_query: Optional[str] = None, **kwargs) -> BaseMessage:
+        if self.mode == "off":
+            return await self.llm.ainvoke(input, config, **kwargs)
+
+        cached, pending = await self._alookup(input, cache_query)
+        if cached is not None:
+            return AIMessage(content=cached)
+
+        response = await self.llm.ainvoke(input, config, **kwargs)
+        await asyncio.to_thread(self._store, pending, _message_text(response))
+        return response
+
+    async def astream(self, input: Any, config: Optional[Dict[str, Any]] = None, *,
+                      cache_query: Optional[str] = None, **kwargs) -> AsyncIterator[BaseMessage]:
+        if self.mode == "off":
+            async for chunk in self.llm.astream(input, config, **kwargs):
+                yield chunk
+            return
+
+        cached, pending = await self._alookup(input, cache_query)
+        if cached is not None:
+            yield AIMessageChunk(content=cached)
+            return
+
+        parts = []
+        async for chunk in self.llm.astream(input, config, **kwargs):
+            parts.append(_message_text(chunk))
+            yield chunk
+        await asyncio.to_thread(self._store, pending, "".join(parts))
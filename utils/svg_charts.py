@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+Lightweight SVG renderers for the demo charts, used by utils.visualization when FAST_VIZ=1.
+
+The charts are small and fixed-shape, so writing the markup directly avoids importing
+matplotlib and building figures, which dominates their cost.
+"""
+
+import math
+from html import escape
+from typing import List, Optional
+
+# Matplotlib's Pastel1 palette
+PASTEL_COLORS = ['#fbb4ae', '#b3cde3', '#ccebc5', '#decbe4', '#fed9a6',
+                 '#ffffcc', '#e5d8bd', '#fddaec', '#f2f2f2']
+
+_FONT = 'font-family="DejaVu Sans, Arial, sans-serif"'
+
+
+def _text(x: float, y: float, text: str, size: int = 12, anchor: str = 'middle', weight: str = 'normal') -> str:
+    return (f'<text x="{x:.1f}" y="{y:.1f}" font-size="{size}" text-anchor="{anchor}" '
+            f'font-weight="{weight}" {_FONT}>{escape(text)}</text>')
+
+
+def _write_svg(output_path: str, width: int, height: int, elements: List[str]) -> str:
+    with open(output_path, 'w') as f:
+        f.write(f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{height}" '
+                f'viewBox="0 0 {width} {height}">\n'
+                f'<rect width="{width}" height="{height}" fill="white"/>\n')
+        f.write('\n'.join(elements))
+        f.write('\n</svg>\n')
+    return output_path
+
+
+def attack_graph_svg(node_names: List[str], title: str, output_path: str) -> str:
+    """Draw a chain of nodes linked by arrows, first node highlighted, running diagonally down"""
+    top, step_x, step_y, radius = 60, 90, 60, 22
+    # Leave room right of the last node for its label (~7px per character at 11px bold)
+    width = max(700, 60 + step_x * (len(node_names) - 1) + radius + 7 * max(map(len, node_names)) + 20)
+    height = top + step_y * len(node_names) + 20
+    elements = [
+        '<defs><marker id="arrow" markerWidth="10" markerHeight="10" refX="9" refY="3" orient="auto">'
+        '<path d="M0,0 L9,3 L0,6 z" fill="gray"/></marker></defs>',
+        _text(width / 2, 30, title, size=16),
+    ]
+
+    centers = [(60 + i * step_x, top + i * step_y) for i in range(len(node_names))]
+    for (x1, y1), (x2, y2) in zip(centers, centers[1:]):
+        # Shorten each edge so the arrowhead stops at the next node's edge
+        length = math.hypot(x2 - x1, y2 - y1)
+        dx, dy = (x2 - x1) / length * radius, (y2 - y1) / length * radius
+        elements.append(f'<line x1="{x1 + dx:.1f}" y1="{y1 + dy:.1f}" x2="{x2 - dx:.1f}" y2="{y2 - dy:.1f}" '
+                        f'stroke="gray" stroke-width="1.5" marker-end="url(#arrow)"/>')
+    for i, ((x, y), name) in enumerate(zip(centers, node_names)):
+        color = 'lightgreen' if i == 0 else 'lightblue'
+        elements.append(f'<circle cx="{x}" cy="{y}" r="{radius}" fill="{color}"/>')
+        elements.append(_text(x + radius + 6, y + 4, name, size=11, anchor='start', weight='bold'))
+
+    return _write_svg(output_path, width, height, elements)
+
+
+def bar_chart_svg(labels: List[str], counts: List[int], colors: List[str], title: str,
+                  xlabel: str, ylabel: str, output_path: str) -> str:
+    """Draw a vertical bar chart with the value printed above each bar"""
+    width, height = 600, 400
+    left, right, top, bottom = 70, 20, 50, 60
+    plot_w, plot_h = width - left - right, height - top - bottom
+    peak = max(max(counts, default=0), 1)
+    slot = plot_w / max(len(labels), 1)
+    bar_w = slot * 0.8
+
+    elements = [
+        _text(width / 2, 30, title, size=16),
+        _text(left + plot_w / 2, height - 15, xlabel),
+        f'<g transform="translate(20,{top + plot_h / 2:.1f}) rotate(-90)">{_text(0, 0, ylabel)}</g>',
+    ]
+    # Dashed grid lines at whole-number ticks
+    tick_step = max(1, math.ceil(peak / 5))
+    for tick in range(0, peak + 1, tick_step):
+        y = top + plot_h - tick / peak * plot_h
+        elements.append(f'<line x1="{left}" y1="{y:.1f}" x2="{width - right}" y2="{y:.1f}" '
+                        f'stroke="#cccccc" stroke-dasharray="4,3"/>')
+        elements.append(_text(left - 8, y + 4, str(tick), size=11, anchor='end'))
+    for i, (label, count, color) in enumerate(zip(labels, counts, colors)):
+        bar_h = count / peak * plot_h
+        x = left + i * slot + (slot - bar_w) / 2
+        y = top + plot_h - bar_h
+        elements.append(f'<rect x="{x:.1f}" y="{y:.1f}" width="{bar_w:.1f}" height="{bar_h:.1f}" fill="{color}"/>')
+        elements.append(_text(x + bar_w / 2, y - 5, str(count)))
+        elements.append(_text(x + bar_w / 2, top + plot_h + 18, label))
+    elements.append(f'<line x1="{left}" y1="{top + plot_h}" x2="{width - right}" y2="{top + plot_h}" stroke="black"/>')
+
+    return _write_svg(output_path, width, height, elements)
+
+
+def pastel_colors(n: int) -> List[str]:
+    """n colors sampled evenly from Pastel1, as matplotlib's Pastel1(np.linspace(0, 1, n)) does"""
+    if n == 1:
+        return PASTEL_COLORS[:1]
+    last = len(PASTEL_COLORS) - 1
+    step = 1.0 / (n - 1)
+    return [PASTEL_COLORS[last if i == n - 1 else min(int(i * step * len(PASTEL_COLORS)), last)]
+            for i in range(n)]
+
+
+def pie_chart_svg(labels: List[str], sizes: List[float], title: str, output_path: str,
+                  explode: Optional[List[float]] = None) -> str:
+    """
+    Draw a pie chart the way the matplotlib path does: wedges run counter-clockwise from
+    12 o'clock in Pastel1 colors, each offset by its explode fraction of the radius, with
+    percentages inside and labels outside.
+    """
+    width, height, cx, cy, radius = 900, 560, 450, 300, 180
+    total = sum(sizes)
+    colors = pastel_colors(len(sizes))
+    explode = explode or [0] * len(sizes)
+    elements = [_text(width / 2, 30, title, size=16)]
+
+    angle = -math.pi / 2
+    for label, size, color, offset in zip(labels, sizes, colors, explode):
+        if total <= 0 or size <= 0:
+            continue
+        # SVG's y axis points down, so counter-clockwise means decreasing angles
+        sweep = size / total * 2 * math.pi
+        middle = angle - sweep / 2
+        cos_m, sin_m = math.cos(middle), math.sin(middle)
+        wx, wy = cx + radius * offset * cos_m, cy + radius * offset * sin_m
+        if sweep >= 2 * math.pi - 1e-9:
+            elements.append(f'<circle cx="{wx:.1f}" cy="{wy:.1f}" r="{radius}" fill="{color}" stroke="white"/>')
+        else:
+            x1, y1 = wx + radius * math.cos(angle), wy + radius * math.sin(angle)
+            x2, y2 = wx + radius * math.cos(angle - sweep), wy + radius * math.sin(angle - sweep)
+            large_arc = 1 if sweep > math.pi else 0
+            elements.append(f'<path d="M{wx:.1f},{wy:.1f} L{x1:.1f},{y1:.1f} A{radius},{radius} 0 {large_arc},0 '
+                            f'{x2:.1f},{y2:.1f} z" fill="{color}" stroke="white"/>')
+
+        elements.append(_text(wx + radius * 0.6 * cos_m, wy + radius * 0.6 * sin_m + 4, f'{size / total:.1%}'))
+        elements.append(_text(wx + radius * 1.1 * cos_m, wy + radius * 1.1 * sin_m + 4, label,
+                              anchor='start' if cos_m >= 0 else 'end'))
+        angle -= sweep
+
+    return _write_svg(output_path, width, height, elements)
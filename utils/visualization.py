@@ -2,134 +2,169 @@
 
 import os
 import re
+import sys
 import json
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-import matplotlib.pyplot as plt
-import networkx as nx
 from typing import Dict, List, Any, Tuple
-import numpy as np
+
+from utils import svg_charts
+
+# With FAST_VIZ=1 charts are written as SVG directly and matplotlib is never imported
+FAST_VIZ = os.getenv("FAST_VIZ", "0") == "1"
+
+if not FAST_VIZ:
+    import matplotlib
+    # Charts are only saved to files; skip GUI backend probing unless pyplot is already in use
+    # (networkx's drawing functions import it)
+    if "matplotlib.pyplot" not in sys.modules:
+        matplotlib.use("Agg")
+    # Charts are built on standalone Figure objects rather than through pyplot, whose
+    # global current-figure state is not thread-safe
+    from matplotlib.figure import Figure
+    import networkx as nx
+    import numpy as np
+
+# State keys of the five worker outputs
+WORKER_KEYS = ("worker1_output", "worker2_output", "worker3_output", "worker4_output", "worker5_output")
+
+# Patterns compiled once at import rather than looked up on every call
+_TS_RE = re.compile(r'(\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2})')
+_CONF_RE = re.compile(r'(HIGH|MEDIUM|LOW) CONFIDENCE', re.IGNORECASE)
 
 def extract_events_timeline(result: Dict[str, Any]) -> List[Dict[str, Any]]:
     """Extract timeline events from worker analyses"""
     events = []
     
     # Process each worker's analysis
-    for i in range(1, 6):
-        worker_key = f"worker{i}_output"
-        if worker_key in result:
-            analysis = result[worker_key]['analysis']
-            role = result[worker_key]['role']
-            
-            # Look for timestamps in the analysis
-            timestamp_pattern = r'(\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2})'
-            matches = re.findall(timestamp_pattern, analysis)
+    for key in WORKER_KEYS:
+        worker = result.get(key)
+        if worker is None:
+            continue
+        analysis = worker['analysis']
+        role = worker['role']
+        
+        # Look for timestamps in the analysis
+        for match in _TS_RE.finditer(analysis):
+            ts = match.group(1)
+            # Extract surrounding context (50 chars before and after)
+            idx = match.start()
+            start = max(0, idx - 50)
+            end = min(len(analysis), idx + 50)
+            context = analysis[start:end].strip()
             
-            for ts in matches:
-                # Extract surrounding context (50 chars before and after)
-                idx = analysis.find(ts)
-                start = max(0, idx - 50)
-                end = min(len(analysis), idx + 50)
-                context = analysis[start:end].strip()
-                
-                # Create an event
-                events.append({
-                    'timestamp': ts,
-                    'description': context,
-                    'source': role,
-                    'datetime': datetime.fromisoformat(ts.replace('Z', '+00:00'))
-                })
-    
+            # Create an event
+            events.append({
+                'timestamp': ts,
+                'description': context,
+                'source': role,
+                'datetime': datetime.fromisoformat(ts.replace('Z', '+00:00'))
+            })
+
     # Sort events by timestamp
     events.sort(key=lambda x: x['datetime'])
     return events
 
 def create_attack_graph(events: List[Dict[str, Any]], query: str) -> str:
     """Create a directed graph visualization of the attack path"""
-    plt.figure(figsize=(12, 8))
+    # Limit to 10 events for readability
+    node_names = ["Initial Access"] + [
+        f"{event['timestamp']}: {event['description'][:30]}..." for event in events[:10]
+    ]
+    title = f"Attack Path Visualization: {query}"
+    
+    if FAST_VIZ:
+        return svg_charts.attack_graph_svg(node_names, title, "output/attack_graph.svg")
+    
+    fig = Figure(figsize=(12, 8))
+    ax = fig.subplots()
     
     G = nx.DiGraph()
     
     # Add nodes and edges
-    prev_node = "Initial Access"
+    prev_node = node_names[0]
     G.add_node(prev_node, color='lightgreen')
     
-    for i, event in enumerate(events[:10]):  # Limit to 10 events for readability
-        node_name = f"{event['timestamp']}: {event['description'][:30]}..."
+    for node_name in node_names[1:]:
         G.add_node(node_name, color='lightblue')
         G.add_edge(prev_node, node_name)
         prev_node = node_name
     
-    # Draw the graph
-    pos = nx.spring_layout(G, k=1, iterations=50)
+    # The attack path is a single chain, so lay it out diagonally in insertion order
+    # rather than running a force-directed layout to rediscover a line
+    pos = {node: (i, -i) for i, node in enumerate(G.nodes())}
     
     # Draw nodes with different colors
     node_colors = [G.nodes[node].get('color', 'lightblue') for node in G.nodes()]
-    nx.draw_networkx_nodes(G, pos, node_color=node_colors, node_size=3000)
+    nx.draw_networkx_nodes(G, pos, node_color=node_colors, node_size=3000, ax=ax)
     
     # Draw edges and labels
-    nx.draw_networkx_edges(G, pos, arrows=True, arrowsize=15, edge_color='gray')
-    nx.draw_networkx_labels(G, pos, font_size=8, font_weight='bold')
+    nx.draw_networkx_edges(G, pos, arrows=True, arrowsize=15, edge_color='gray', ax=ax)
+    nx.draw_networkx_labels(G, pos, font_size=8, font_weight='bold', ax=ax)
     
-    plt.title(f"Attack Path Visualization: {query}")
-    plt.axis('off')
-    plt.tight_layout()
+    ax.set_title(title)
+    ax.margins(x=0.15, y=0.05)  # Room for the labels of the last nodes
+    ax.axis('off')
+    fig.tight_layout()
     
     # Save the graph
     output_path = "output/attack_graph.png"
-    plt.savefig(output_path, dpi=300, bbox_inches='tight')
-    plt.close()
+    fig.savefig(output_path, dpi=300, bbox_inches='tight')
     
     return output_path
 
 def create_confidence_chart(critique: str) -> str:
     """Create a bar chart of confidence levels"""
-    plt.figure(figsize=(10, 6))
-    
-    # Extract confidence levels
-    high_confidence = len(re.findall(r'HIGH CONFIDENCE', critique, re.IGNORECASE))
-    medium_confidence = len(re.findall(r'MEDIUM CONFIDENCE', critique, re.IGNORECASE))
-    low_confidence = len(re.findall(r'LOW CONFIDENCE', critique, re.IGNORECASE))
+    # Extract confidence levels in a single pass over the critique
+    counts = Counter(match.group(1).upper() for match in _CONF_RE.finditer(critique))
     
     # Create bar chart
     confidence_levels = ['High', 'Medium', 'Low']
-    confidence_counts = [high_confidence, medium_confidence, low_confidence]
+    confidence_counts = [counts['HIGH'], counts['MEDIUM'], counts['LOW']]
     colors = ['#2ecc71', '#f1c40f', '#e74c3c']  # Green, Yellow, Red
     
-    bars = plt.bar(confidence_levels, confidence_counts, color=colors)
+    if FAST_VIZ:
+        return svg_charts.bar_chart_svg(confidence_levels, confidence_counts, colors,
+                                        'Finding Confidence Levels (After Voting)',
+                                        'Confidence Level', 'Number of Findings',
+                                        "output/confidence_levels.svg")
+    
+    fig = Figure(figsize=(10, 6))
+    ax = fig.subplots()
+    
+    bars = ax.bar(confidence_levels, confidence_counts, color=colors)
     
     # Add value labels on top of bars
     for bar in bars:
         height = bar.get_height()
-        plt.text(bar.get_x() + bar.get_width()/2., height,
+        ax.text(bar.get_x() + bar.get_width()/2., height,
                 f'{int(height)}',
                 ha='center', va='bottom')
     
-    plt.title('Finding Confidence Levels (After Voting)')
-    plt.xlabel('Confidence Level')
-    plt.ylabel('Number of Findings')
-    plt.grid(axis='y', linestyle='--', alpha=0.7)
+    ax.set_title('Finding Confidence Levels (After Voting)')
+    ax.set_xlabel('Confidence Level')
+    ax.set_ylabel('Number of Findings')
+    ax.grid(axis='y', linestyle='--', alpha=0.7)
     
     # Save the chart
     output_path = "output/confidence_levels.png"
-    plt.savefig(output_path, dpi=300, bbox_inches='tight')
-    plt.close()
+    fig.savefig(output_path, dpi=300, bbox_inches='tight')
     
     return output_path
 
 def create_specialist_chart(result: Dict[str, Any]) -> str:
     """Create a pie chart of specialist contributions"""
-    plt.figure(figsize=(10, 8))
-    
     # Count how many findings each specialist contributed
     specialist_contributions = {}
     
-    for i in range(1, 6):
-        worker_key = f"worker{i}_output"
-        if worker_key in result:
-            role = result[worker_key]['role']
-            # Count paragraphs as rough proxy for findings
-            paragraphs = len(result[worker_key]['analysis'].split('\n\n'))
-            specialist_contributions[role] = paragraphs
+    for key in WORKER_KEYS:
+        worker = result.get(key)
+        if worker is None:
+            continue
+        # Count paragraphs as rough proxy for findings
+        paragraphs = worker['analysis'].count('\n\n') + 1
+        specialist_contributions[worker['role']] = paragraphs
     
     # Create pie chart
     labels = list(specialist_contributions.keys())
@@ -139,18 +174,24 @@ def create_specialist_chart(result: Dict[str, Any]) -> str:
     explode = [0.1 if any(key in l for key in ["Lateral Movement", "Initial Access", "Credential"]) 
               else 0 for l in labels]
     
+    if FAST_VIZ:
+        return svg_charts.pie_chart_svg(labels, sizes, 'Specialist Contribution to Investigation',
+                                        "output/specialist_contributions.svg", explode=explode)
+    
+    fig = Figure(figsize=(10, 8))
+    ax = fig.subplots()
+    
     # Use a color palette
-    colors = plt.cm.Pastel1(np.linspace(0, 1, len(labels)))
+    colors = matplotlib.colormaps['Pastel1'](np.linspace(0, 1, len(labels)))
     
-    plt.pie(sizes, explode=explode, labels=labels, colors=colors,
-            autopct='%1.1f%%', shadow=True, startangle=90)
-    plt.axis('equal')
-    plt.title('Specialist Contribution to Investigation')
+    ax.pie(sizes, explode=explode, labels=labels, colors=colors,
+           autopct='%1.1f%%', shadow=True, startangle=90)
+    ax.axis('equal')
+    ax.set_title('Specialist Contribution to Investigation')
     
     # Save the chart
     output_path = "output/specialist_contributions.png"
-    plt.savefig(output_path, dpi=300, bbox_inches='tight')
-    plt.close()
+    fig.savefig(output_path, dpi=300, bbox_inches='tight')
     
     return output_path
 
@@ -161,22 +202,20 @@ def visualize_results(result: Dict[str, Any], query: str) -> Dict[str, str]:
         os.makedirs("output")
     
     try:
-        # 1. Create attack graph visualization
         events = extract_events_timeline(result)
-        attack_graph_path = create_attack_graph(events, query)
-        
-        # 2. Create confidence visualization
         critique = result.get('critique_output', {}).get('assessment', '')
-        confidence_chart_path = create_confidence_chart(critique)
         
-        # 3. Create specialist contribution visualization
-        specialist_chart_path = create_specialist_chart(result)
-        
-        return {
-            "attack_graph": attack_graph_path,
-            "confidence_levels": confidence_chart_path,
-            "specialist_contributions": specialist_chart_path
-        }
+        # The charts are independent, and PNG encoding releases the GIL, so render them concurrently
+        with ThreadPoolExecutor(max_workers=3) as executor:
+            futures = {
+                # 1. Create attack graph visualization
+                "attack_graph": executor.submit(create_attack_graph, events, query),
+                # 2. Create confidence visualization
+                "confidence_levels": executor.submit(create_confidence_chart, critique),
+                # 3. Create specialist contribution visualization
+                "specialist_contributions": executor.submit(create_specialist_chart, result),
+            }
+            return {name: future.result() for name, future in futures.items()}
         
     except Exception as e:
         print(f"Error in visualization: {str(e)}")